@@ -0,0 +1,44 @@
+# Hand gesture control of the mouse cursor and media playback with MediaPipe Hands.
+#
+# Importing the package loads neither OpenCV nor MediaPipe. The names below are only imported from
+# their module the first time they are used, e.g. `handcontrol.HandController`, and MediaPipe itself
+# only when a `HandController` is opened. The command line entry point is in `cli.py`.
+
+import importlib
+import time
+
+# Time the package was imported, the start of the startup times measured by `HandController`.
+IMPORTED = time.perf_counter()
+
+# Public names of the package and the module defining each of them.
+_EXPORTS = {
+    "HandController": "controller",
+    "add_controller_arguments": "controller",
+    "Calibration": "calibration",
+    "CameraSettings": "camera",
+    "open_camera": "camera",
+    "InputDispatcher": "dispatch",
+    "EventServer": "events",
+    "subscribe": "events",
+    "Condition": "gestures",
+    "GestureEngine": "gestures",
+    "Profile": "gestures",
+    "Rule": "gestures",
+    "QualityGovernor": "governor",
+    "Instrumentation": "instrumentation",
+    "landmarks_to_array": "landmarks",
+    "mirror_landmarks": "landmarks",
+    "ScreenMapping": "mapping",
+    "Recorder": "recording",
+    "open_recording": "recording",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,6 @@
+from .cli import main
+
+# The guard keeps the processes started by `handcontrol multiproc`, which import this module again,
+# from running the command a second time.
+if __name__ == "__main__":
+    main()
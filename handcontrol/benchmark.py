@@ -0,0 +1,551 @@
+# Headless benchmark for the gesture pipeline.
+#
+# `virtual_mouse.py` and `virtual_keyboard.py` need a webcam, a desktop session and real input devices
+# when they are run. This script feeds video files or synthetic frame sequences through the same
+# stages (`FramePreparer`, `hands.process`, `landmarks_to_array`, `countFingers` and the preview overlays)
+# with stand-in mouse and keyboard controllers that only record the events they receive. It reports
+# the p50/p95/p99 latency of every stage, the frames per second and the events emitted, and saves the
+# results as JSON so runs can be compared.
+#
+# Examples:
+#
+#     python -m handcontrol benchmark --synthetic 300 --synthetic-hands --output results.json
+#     python -m handcontrol benchmark --video clip.mp4 --profile mouse --compare results.json
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter, defaultdict
+
+# pynput connects to the desktop as soon as its mouse and keyboard modules are imported. The
+# benchmark never injects real input, so the dummy backend is selected before the scripts import it.
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+import cv2
+import numpy as np
+
+from . import virtual_keyboard
+from . import virtual_mouse
+from .camera import parse_size
+from .capture import SyntheticCapture
+from .controller import draw_hand_landmarks
+from .dispatch import InputDispatcher
+from .display import PreviewWindow
+from .filters import FILTERS, make_filter
+from .frames import FramePreparer
+from .instrumentation import AllocationMeter, summarize
+from .landmarks import landmarks_to_array, mirror_landmarks, pinch
+from .roi import RoiHands
+
+# Stages reported in the order they run for every frame.
+STAGES = ["capture", "prepare", "process", "landmarks", "draw", "gesture"]
+
+
+class RecordingMouse:
+    """
+    Stand-in for `pynput.mouse.Controller` that records every event instead of moving the cursor.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self._position = (0, 0)
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        self._position = value
+        self.events.append((time.perf_counter(), "mouse.move", tuple(float(v) for v in value)))
+
+    def press(self, button):
+        self.events.append((time.perf_counter(), "mouse.press", str(button)))
+
+    def release(self, button):
+        self.events.append((time.perf_counter(), "mouse.release", str(button)))
+
+    def click(self, button, count=1):
+        self.events.append((time.perf_counter(), "mouse.click", str(button)))
+
+    def scroll(self, dx, dy):
+        self.events.append((time.perf_counter(), "mouse.scroll", (dx, dy)))
+
+
+class RecordingKeyboard:
+    """
+    Stand-in for `pynput.keyboard.Controller` that records every event instead of pressing keys.
+    """
+
+    def __init__(self, events):
+        self.events = events
+
+    def press(self, key):
+        self.events.append((time.perf_counter(), "keyboard.press", str(key)))
+
+    def release(self, key):
+        self.events.append((time.perf_counter(), "keyboard.release", str(key)))
+
+    def tap(self, key):
+        self.press(key)
+        self.release(key)
+
+
+# Landmarks of an open right hand with the fingers pointing up, relative to the middle of the palm and
+# in normalized image units. `ScriptedHands` moves, closes and pinches this template to produce hand
+# landmarks without running the model.
+HAND_TEMPLATE = np.array(
+    [
+        [0.00, 0.20, 0.0],
+        [-0.05, 0.17, 0.0], [-0.09, 0.12, 0.0], [-0.11, 0.07, 0.0], [-0.13, 0.03, 0.0],
+        [-0.04, 0.05, 0.0], [-0.04, -0.02, 0.0], [-0.04, -0.07, 0.0], [-0.04, -0.11, 0.0],
+        [0.00, 0.04, 0.0], [0.00, -0.04, 0.0], [0.00, -0.09, 0.0], [0.00, -0.13, 0.0],
+        [0.04, 0.05, 0.0], [0.04, -0.02, 0.0], [0.04, -0.06, 0.0], [0.04, -0.10, 0.0],
+        [0.08, 0.07, 0.0], [0.08, 0.02, 0.0], [0.08, -0.01, 0.0], [0.08, -0.04, 0.0],
+    ],
+    dtype=np.float32,
+)
+
+
+def scripted_hand(open_fingers=4, pinched=False, center=(0.5, 0.5)):
+    """
+    Builds the `(21, 3)` landmarks of a synthetic hand.
+
+    :param open_fingers: How many fingers, starting from the index finger, are open
+    :param pinched: Move the thumb tip onto the index finger tip
+    :param center: Normalized position of the middle of the palm
+    """
+    hand = HAND_TEMPLATE.copy()
+    for finger in range(open_fingers, 4):
+        tip = 8 + 4 * finger
+        # Fold the finger by moving its two top joints below the joint they are compared with.
+        hand[tip - 1, 1] = hand[tip - 2, 1] + 0.03
+        hand[tip, 1] = hand[tip - 2, 1] + 0.05
+    if pinched:
+        hand[4, :2] = hand[8, :2] + 0.005
+    hand[:, :2] += np.array(center, dtype=np.float32)
+    return hand
+
+
+class ScriptedHands:
+    """
+    Stand-in for `mp_hands.Hands` that returns a scripted hand instead of running the model, so the
+    gesture and drawing stages can be exercised on synthetic frames. The script cycles through an open
+    hand, a fist (pause), one finger on the left and right of the frame (seek) and a pinch dragged
+    across the frame (mouse button), with a short gap without any hand.
+
+    :param phase_length: Number of frames every phase of the script lasts
+    :param noise: Standard deviation of the Gaussian noise added to the landmarks, in normalized image
+    units, to imitate the jitter of the model. The noise-free hand of the last frame is kept in
+    `truth` to measure how well the cursor follows it.
+    """
+
+    def __init__(self, phase_length=30, noise=0.0):
+        from mediapipe.framework.formats import landmark_pb2
+
+        self._landmark_pb2 = landmark_pb2
+        self.phase_length = phase_length
+        self.noise = noise
+        self.frame = 0
+        self.truth = None
+        self._rng = np.random.default_rng(0)
+
+    def _hand(self):
+        phase, step = divmod(self.frame, self.phase_length)
+        progress = step / self.phase_length
+        phase %= 6
+
+        if phase == 0:
+            return scripted_hand(4, center=(0.45 + 0.1 * progress, 0.5))
+        if phase == 1:
+            return scripted_hand(0, center=(0.5, 0.5))
+        if phase == 2:
+            return scripted_hand(1, center=(0.2, 0.5))
+        if phase == 3:
+            return scripted_hand(1, center=(0.98, 0.5))
+        if phase == 4:
+            return scripted_hand(4, pinched=step < self.phase_length // 2, center=(0.3 + 0.4 * progress, 0.5))
+        return None
+
+    def process(self, image):
+        hand = self.truth = self._hand()
+        self.frame += 1
+
+        # The script describes the hand as the user sees it in the mirrored preview, while the model
+        # reports it in camera coordinates, which the pipeline mirrors back.
+        if hand is not None:
+            hand = mirror_landmarks(hand[None].copy())[0]
+        if hand is not None and self.noise:
+            hand = hand + self._rng.normal(0.0, self.noise, hand.shape).astype(np.float32)
+
+        multi_hand_landmarks = None
+        if hand is not None:
+            landmark_list = self._landmark_pb2.NormalizedLandmarkList()
+            for x, y, z in hand:
+                landmark_list.landmark.add(x=float(x), y=float(y), z=float(z))
+            multi_hand_landmarks = [landmark_list]
+
+        return type("ScriptedResults", (), {"multi_hand_landmarks": multi_hand_landmarks})()
+
+    def close(self):
+        pass
+
+
+def cursor_metrics(samples, max_lag=15, settle=10, jump=0.05):
+    """
+    Measures how well the cursor follows the scripted hand.
+
+    :param samples: `(frame, truth, cursor)` tuples, where `truth` is the screen position of the
+    noise-free pinch center and `cursor` the position the cursor was moved to on that frame
+    :param settle: Number of frames left out after the scripted hand jumps to a new place (a change of
+    phase in the script), which no real hand does
+    :param jump: Movement between two frames, as a fraction of the path's extent, counted as a jump
+    :return: The mean and p95 distance between both in pixels, the jitter (the RMS of the second
+    difference of that distance over consecutive frames, so the movement of the hand itself does not
+    count), and the lag in frames that best aligns the cursor path with the noise-free path
+    """
+    if len(samples) < 3:
+        return {}
+
+    frames = np.array([frame for frame, _, _ in samples])
+    truth = np.array([t for _, t, _ in samples], dtype=np.float64)
+    cursor = np.array([c for _, _, c in samples], dtype=np.float64)
+
+    # Leave out the frames following a gap or a jump of the scripted hand.
+    step = np.linalg.norm(np.diff(truth, axis=0), axis=1)
+    extent = np.linalg.norm(truth.max(axis=0) - truth.min(axis=0)) or 1.0
+    breaks = np.flatnonzero((step > jump * extent) | (np.diff(frames) != 1)) + 1
+    keep = np.ones(len(samples), dtype=bool)
+    keep[:settle] = False
+    for start in breaks:
+        keep[start : start + settle] = False
+    if keep.sum() < 3:
+        return {}
+    all_frames, all_truth = frames, truth
+    frames, truth, cursor = frames[keep], truth[keep], cursor[keep]
+
+    error = np.linalg.norm(cursor - truth, axis=1)
+
+    # Second differences are only taken over three consecutive frames with a hand.
+    consecutive = (frames[2:] - frames[:-2]) == 2
+
+    residual = cursor - truth
+    second = residual[2:] - 2 * residual[1:-1] + residual[:-2]
+    jitter = float(np.sqrt(np.mean(np.sum(second[consecutive] ** 2, axis=1)))) if consecutive.any() else 0.0
+
+    # The cursor of every kept frame is compared with the truth `lag` frames earlier, looked up by frame
+    # number: the frames left out above, and the frames without a hand, leave holes in the arrays, so
+    # shifting them by one index is not always shifting them by one frame.
+    lags = []
+    for lag in range(min(max_lag, len(samples) - 1) + 1):
+        index = np.minimum(np.searchsorted(all_frames, frames - lag), len(all_frames) - 1)
+        found = all_frames[index] == frames - lag
+        if not found.any():
+            break
+        lags.append(np.mean(np.linalg.norm(cursor[found] - all_truth[index[found]], axis=1)))
+
+    return {
+        "samples": int(len(frames)),
+        "error_mean_px": float(error.mean()),
+        "error_p95_px": float(np.percentile(error, 95)),
+        "jitter_rms_px": jitter,
+        "lag_frames": int(np.argmin(lags)),
+    }
+
+
+def open_sources(args):
+    """
+    Returns a list of `(name, capture)` pairs for the video files and synthetic sequences requested on
+    the command line.
+    """
+    sources = []
+    for path in args.video:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            sys.exit("Could not open video file: {}".format(path))
+        sources.append((path, cap))
+
+    if args.synthetic or not sources:
+        width, height = args.size
+        sources.append((
+            "synthetic",
+            SyntheticCapture(
+                frames=args.synthetic or 300, width=width, height=height, fps=args.fps, realtime=args.realtime
+            ),
+        ))
+    return sources
+
+
+def run_source(cap, args, timings, events, counters, cursor_samples, allocations):
+    """
+    Runs every frame of one capture source through the pipeline and returns the number of frames
+    processed and the time they took.
+    """
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    mouse = RecordingMouse(events)
+    keyboard = RecordingKeyboard(events)
+    dispatchers = []
+    if not args.sync_dispatch:
+        mouse = InputDispatcher(mouse).start()
+        keyboard = InputDispatcher(keyboard, rate_limits={
+            virtual_keyboard.Key.left: args.seek_rate, virtual_keyboard.Key.right: args.seek_rate,
+        }).start()
+        dispatchers = [("mouse", mouse), ("keyboard", keyboard)]
+
+    cursor_filter = None if args.filter == "none" else make_filter(args.filter)
+    # With `--profile both`, the keyboard profile is added to the gesture engine of the mouse, so both
+    # are evaluated in one pass like `virtual_mouse.py --media-keys` does.
+    virtual_keyboard.configure(keyboard, (width, height))
+    profiles = [virtual_keyboard.profile] if args.profile == "both" else []
+    virtual_mouse.configure(mouse, (width, height), args.screen, filter=cursor_filter, profiles=profiles)
+    gestures = virtual_keyboard if args.profile == "keyboard" else virtual_mouse
+    for module in (virtual_mouse, virtual_keyboard):
+        module.debug.enabled = args.verbose
+        module.debug.every = args.debug_every
+
+    if args.synthetic_hands:
+        hands = ScriptedHands(noise=args.landmark_noise)
+    else:
+        from mediapipe.python.solutions import hands as mp_hands
+
+        def make_hands():
+            return mp_hands.Hands(
+                model_complexity=args.model_complexity,
+                max_num_hands=args.max_num_hands,
+                min_detection_confidence=0.8,
+                min_tracking_confidence=0.5,
+            )
+
+        # `--roi` runs one model on the crops and another on the full frames, see `roi.py`.
+        hands = RoiHands(make_hands(), make_hands(), roi_size=args.roi_size) if args.roi else make_hands()
+
+    preview = PreviewWindow(headless=not args.draw, every=args.preview_every, scale=args.preview_scale)
+    prepare = FramePreparer()
+
+    # The frames are read into a reused buffer, like `LatestFrameCapture` does.
+    buffer = None
+
+    # Video files, and synthetic frames without `--realtime`, are read as fast as possible, so the time
+    # they are read at says nothing about how far apart they were captured, and the cursor filters would
+    # see the hand move 30 times too fast. Their frames are timed from their position in the stream
+    # instead, and `virtual_mouse.clock` runs from that time plus the time spent since the frame was
+    # read, so the filters still predict over the real processing latency.
+    paced = getattr(cap, "realtime", False)
+    fps = cap.get(cv2.CAP_PROP_FPS) or args.fps
+    clock_offset = 0.0
+    if not paced:
+        virtual_mouse.clock = lambda: time.perf_counter() - clock_offset
+
+    frames = 0
+    elapsed = 0.0
+
+    # With `--verbose` the scripts print sampled debugging information. It is written to `os.devnull`
+    # so the cost stays in the measurement without flooding the report.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        while frames < args.max_frames or not args.max_frames:
+            allocations.tick()
+            start = time.perf_counter()
+            success, image = cap.read() if buffer is None else cap.read(buffer)
+            t_capture = time.perf_counter()
+            if not success:
+                break
+            buffer = image
+            timestamp = t_capture
+            if not paced:
+                timestamp = (cap.get(cv2.CAP_PROP_POS_FRAMES) - 1) / fps
+                clock_offset = t_capture - timestamp
+
+            rgb_image = prepare.prepare(image)
+            t_prepare = time.perf_counter()
+
+            results = hands.process(rgb_image)
+            t_process = time.perf_counter()
+
+            hand_landmarks = results.multi_hand_landmarks
+            hands_array = mirror_landmarks(landmarks_to_array(hand_landmarks))
+            t_landmarks = time.perf_counter()
+
+            # The preview is drawn but never shown, as there is no window.
+            if preview.due():
+                preview_image = preview.prepare(image)
+                draw_hand_landmarks(preview_image, hand_landmarks)
+                preview.mirror(preview_image)
+                virtual_mouse.drawPinch(preview_image, hands_array, handNo=0)
+            t_draw = time.perf_counter()
+
+            timings["capture"].append(t_capture - start)
+            timings["prepare"].append(t_prepare - t_capture)
+            timings["process"].append(t_process - t_prepare)
+            timings["landmarks"].append(t_landmarks - t_process)
+            timings["draw"].append(t_draw - t_landmarks)
+
+            gestures.countFingers(hands_array, timestamp=timestamp)
+            end = time.perf_counter()
+            timings["gesture"].append(end - t_draw)
+
+            # With a scripted hand the noise-free pinch center is known, so the cursor position can be
+            # compared with where it should be.
+            if args.profile != "keyboard" and len(hands_array) and getattr(hands, "truth", None) is not None:
+                center, _ = pinch(hands.truth[None], width, height)
+                truth = virtual_mouse.mapping.apply(float(center[0, 0]), float(center[0, 1]))
+                cursor_samples.append((frames, truth, mouse.position))
+
+            timings["total"].append(end - start)
+            elapsed += end - start
+            frames += 1
+
+    for name, dispatcher in dispatchers:
+        dispatcher.stop()
+        for key, value in dispatcher.stats().items():
+            if not key.endswith("_ms"):
+                counters["{}_dispatch_{}".format(name, key)] += value
+
+    for key, value in gestures.engine.stats().items():
+        counters["gesture_" + key] += value
+
+    if isinstance(hands, RoiHands):
+        for key, value in hands.stats().items():
+            counters[key] += value
+
+    virtual_mouse.clock = time.perf_counter
+    hands.close()
+    cap.release()
+    return frames, elapsed
+
+
+def compare(report, baseline_path):
+    """
+    Prints how the p50/p95/p99 latencies and the frame rate changed against a previous report.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print("\nCompared with {}:".format(baseline_path))
+    for stage, summary in report["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or not summary.get("count") or not old.get("count"):
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (summary[key] - old[key]) / old[key] * 100.0 if old[key] else 0.0
+            changes.append("{} {:+.1f}%".format(key[:3], change))
+        print("  {:<18} {}".format(stage, "  ".join(changes)))
+
+    if baseline.get("fps"):
+        print("  {:<18} {:+.1f}%".format("fps", (report["fps"] - baseline["fps"]) / baseline["fps"] * 100.0))
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark the gesture pipeline without a webcam.")
+    parser.add_argument("--video", action="append", default=[], help="video file to feed through the pipeline (repeatable)")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic frames to generate")
+    parser.add_argument("--size", type=parse_size, default=(640, 480), help="size of the synthetic frames, e.g. 640x480")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate reported by the synthetic source")
+    parser.add_argument("--screen", type=parse_size, default=(1920, 1080), help="screen size used for the cursor mapping")
+    parser.add_argument("--realtime", action="store_true", help="deliver synthetic frames at --fps like a camera")
+    parser.add_argument("--synthetic-hands", action="store_true", help="replace hands.process with a scripted hand")
+    parser.add_argument("--landmark-noise", type=float, default=0.0, help="noise added to the scripted hand, in normalized units")
+    parser.add_argument("--filter", choices=list(FILTERS), default="none", help="cursor smoothing and prediction filter")
+    parser.add_argument("--profile", choices=["mouse", "keyboard", "both"], default="both")
+    parser.add_argument("--no-draw", dest="draw", action="store_false", help="skip drawing the preview overlays, like --headless")
+    parser.add_argument("--preview-every", type=int, default=1, help="only draw the overlays on one frame out of this many")
+    parser.add_argument("--preview-scale", type=float, default=1.0, help="draw the overlays on a copy scaled by this factor")
+    parser.add_argument("--sync-dispatch", action="store_true", help="call the controllers directly instead of through InputDispatcher")
+    parser.add_argument("--seek-rate", type=float, default=5.0, help="maximum number of seek key taps per second")
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--max-num-hands", type=int, default=2)
+    parser.add_argument("--roi", action="store_true", help="run inference on a downscaled crop around the tracked hand")
+    parser.add_argument("--roi-size", type=int, default=256)
+    parser.add_argument("--allocations", action="store_true", help="measure the memory allocated for every frame (slows the pipeline down)")
+    parser.add_argument("--max-frames", type=int, default=0, help="stop every source after this many frames")
+    parser.add_argument("--verbose", action="store_true", help="enable the sampled debugging output of the scripts")
+    parser.add_argument("--debug-every", type=int, default=30)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args(argv)
+    if args.roi and args.synthetic_hands:
+        parser.error("--roi needs the real model, it cannot be combined with --synthetic-hands")
+
+    timings = defaultdict(list)
+    events = []
+    counters = Counter()
+    cursor_samples = []
+    frames = 0
+    elapsed = 0.0
+    allocations = AllocationMeter(args.allocations).start()
+
+    for name, cap in open_sources(args):
+        source_frames, source_elapsed = run_source(cap, args, timings, events, counters, cursor_samples, allocations)
+        print("{}: {} frames in {:.2f}s".format(name, source_frames, source_elapsed))
+        frames += source_frames
+        elapsed += source_elapsed
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "opencv": cv2.__version__,
+        },
+        "config": {
+            "video": args.video,
+            "synthetic": args.synthetic,
+            "size": list(args.size),
+            "synthetic_hands": args.synthetic_hands,
+            "landmark_noise": args.landmark_noise,
+            "realtime": args.realtime,
+            "filter": args.filter,
+            "sync_dispatch": args.sync_dispatch,
+            "seek_rate": args.seek_rate,
+            "profile": args.profile,
+            "draw": args.draw,
+            "preview_every": args.preview_every,
+            "preview_scale": args.preview_scale,
+            "model_complexity": args.model_complexity,
+            "max_num_hands": args.max_num_hands,
+            "roi": args.roi,
+            "roi_size": args.roi_size,
+            "allocations": args.allocations,
+        },
+        "frames": frames,
+        "elapsed_s": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "stages": {stage: summarize(timings[stage]) for stage in STAGES + ["total"] if stage in timings},
+        "events": dict(Counter(kind for _, kind, _ in events)),
+        "events_total": len(events),
+        "counters": dict(counters),
+        "cursor": cursor_metrics(cursor_samples),
+        "allocations": allocations.stats(),
+    }
+    allocations.stop()
+
+    print("\n{:<18} {:>9} {:>9} {:>9} {:>9}".format("stage", "mean ms", "p50 ms", "p95 ms", "p99 ms"))
+    for stage, summary in report["stages"].items():
+        print("{:<18} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+            stage, summary["mean_ms"], summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]
+        ))
+    print("\nFrames: {}  FPS: {:.1f}  Events: {}".format(frames, report["fps"], report["events"]))
+    if report["cursor"]:
+        print("Cursor: {}".format(report["cursor"]))
+    if args.allocations:
+        print("Allocations: {}".format(report["allocations"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to {}".format(args.output))
+
+    if args.compare:
+        compare(report, args.compare)
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# Calibration of the pinch threshold and of the active region of the cursor.
+#
+#     python -m handcontrol calibrate
+#     python -m handcontrol mouse --calibration ~/.config/handcontrol/calibration.json
+#
+# The pinch is measured in palm sizes (see `palm_size()` in `landmarks.py`), so the default thresholds
+# already hold at any resolution and any distance from the camera. Hands still differ in how far apart
+# the tips rest when open and how close they get when pinched, so `calibrate` measures both once, for
+# a few seconds each, puts the threshold between them, and measures the area the pinch moves over to
+# map it to the whole screen (see `mapping.py`). The result is saved as JSON and loaded by the mouse on
+# the next runs, from `--calibration` or from the default path when it exists.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .gestures import PALM_SIZE, PINCH_RATIO, PINCH_X, PINCH_Y, GestureEngine, Profile, Rule
+
+# Pinch ratio at or below which the thumb and index finger are pinched, and above which they are no
+# longer pinched once they were, when there is no calibration.
+DEFAULT_PINCH = 0.45
+DEFAULT_PINCH_RELEASE = 0.55
+
+# Steps of the calibration and the instruction shown for each of them.
+PHASES = (
+    ("open", "Hold your hand up, open, with the thumb and index finger apart"),
+    ("pinch", "Pinch the tips of your thumb and index finger together"),
+    ("region", "Keep pinching and move your hand over the whole area you want to use"),
+)
+
+
+def default_path():
+    """
+    Returns the path the calibration is saved to and loaded from by default.
+    """
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config, "handcontrol", "calibration.json")
+
+
+class Calibration:
+    """
+    The thresholds and active region measured by `calibrate`.
+
+    :param pinch: Pinch ratio at or below which the pinch starts
+    :param pinch_release: Pinch ratio above which the pinch ends
+    :param region: Active region `(left, top, right, bottom)` of the frame in fractions of its size, or
+    `None` to use the margin
+    :param palm_size: Median palm size in pixels during the calibration, for information
+    :param frame_size: Size of the frames the calibration was measured on, for information
+    """
+
+    def __init__(self, pinch=DEFAULT_PINCH, pinch_release=DEFAULT_PINCH_RELEASE, region=None, palm_size=None, frame_size=None):
+        self.pinch = pinch
+        self.pinch_release = pinch_release
+        self.region = None if region is None else tuple(region)
+        self.palm_size = palm_size
+        self.frame_size = None if frame_size is None else tuple(frame_size)
+
+    def __repr__(self):
+        return "Calibration(pinch={:.3f}, pinch_release={:.3f}, region={})".format(
+            self.pinch, self.pinch_release, self.region
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(vars(self), f, indent=2)
+
+
+def add_calibration_arguments(parser):
+    """
+    Adds the option selecting the calibration file to an `argparse` parser.
+    """
+    parser.add_argument("--calibration", help="calibration written by `handcontrol calibrate` (defaults to {} when it exists)".format(default_path()))
+
+
+def load_calibration(args):
+    """
+    Loads the calibration selected by `add_calibration_arguments()`, or the one at the default path
+    when none is given and it exists. Returns the default thresholds otherwise.
+    """
+    if args.calibration:
+        return Calibration.load(args.calibration)
+    if os.path.exists(default_path()):
+        print("Using the calibration of {}".format(default_path()))
+        return Calibration.load(default_path())
+    return Calibration()
+
+
+class CalibrationSession:
+    """
+    Collects the pinch ratios, palm sizes and pinch positions of the calibration. `update()` is called
+    with the features of the hand on every frame, and moves through `PHASES`, `seconds` each, ignoring
+    the first `settle` seconds of each phase while the hand gets into position.
+
+    :param frame_size: The `(width, height)` of the video frames in pixels
+    :param seconds: Duration of every phase
+    :param settle: Time at the start of every phase the samples are ignored
+    :param done: `threading.Event` set once the last phase is over
+    :param log: Function the instructions are printed with
+    """
+
+    def __init__(self, frame_size, seconds=4.0, settle=1.0, done=None, log=print):
+        self.width, self.height = frame_size
+        self.seconds = seconds
+        self.settle = settle
+        self.done = done
+        self.log = log
+        self.phase = 0
+        self.samples = {name: [] for name, _ in PHASES}
+        self._started = None
+
+    def update(self, features, timestamp=None):
+        now = time.perf_counter() if timestamp is None else timestamp
+        if self.phase >= len(PHASES):
+            return
+        if self._started is None:
+            self._started = now
+            self.log(PHASES[self.phase][1])
+
+        elapsed = now - self._started
+        if elapsed >= self.seconds:
+            self.phase += 1
+            self._started = None
+            if self.phase >= len(PHASES) and self.done is not None:
+                self.done.set()
+            return
+        if elapsed >= self.settle:
+            self.samples[PHASES[self.phase][0]].append(features[[PINCH_RATIO, PALM_SIZE, PINCH_X, PINCH_Y]].copy())
+
+    def result(self):
+        """
+        Returns the `Calibration` measured, and raises `ValueError` when a phase has no samples or the
+        open and pinched hands cannot be told apart.
+        """
+        for name, _ in PHASES:
+            if not self.samples[name]:
+                raise ValueError("No hand was seen during the {!r} step".format(name))
+        opened = np.array(self.samples["open"])
+        pinched = np.array(self.samples["pinch"] + self.samples["region"])
+        region = np.array(self.samples["region"])
+
+        # The threshold lies 40% of the way from the widest pinch to the narrowest open hand, and the
+        # release 60% of the way, ignoring the 10% of outliers on either side.
+        closed, opened = np.percentile(pinched[:, 0], 90), np.percentile(opened[:, 0], 10)
+        if opened <= closed:
+            raise ValueError(
+                "The open hand (pinch ratio {:.2f}) and the pinch ({:.2f}) overlap, try again with the "
+                "thumb and index finger further apart".format(opened, closed)
+            )
+        gap = opened - closed
+
+        # The active region covers the pinch positions but the 2% at each end, which are mostly the
+        # hand entering or leaving the area, in fractions of the frame.
+        left, top = np.percentile(region[:, 2:], 2, axis=0) / (self.width, self.height)
+        right, bottom = np.percentile(region[:, 2:], 98, axis=0) / (self.width, self.height)
+        if right - left < 0.1 or bottom - top < 0.1:
+            raise ValueError("The pinch moved over too small an area, try again over a wider one")
+
+        return Calibration(
+            pinch=round(float(closed + 0.4 * gap), 3),
+            pinch_release=round(float(closed + 0.6 * gap), 3),
+            region=tuple(round(float(value), 3) for value in (left, top, right, bottom)),
+            palm_size=round(float(np.median(pinched[:, 1])), 1),
+            frame_size=(self.width, self.height),
+        )
+
+
+def main(argv=None, prog=None):
+    """
+    Runs the calibration on the camera and saves the result.
+    """
+    from .controller import HandController, add_controller_arguments
+    from .display import install_stop_handlers
+
+    parser = argparse.ArgumentParser(prog=prog, description="Measure the pinch threshold and active region of the mouse.")
+    add_controller_arguments(parser)
+    parser.add_argument("--output", default=default_path(), help="file the calibration is saved to")
+    parser.add_argument("--seconds", type=float, default=4.0, help="duration of every step")
+    args = parser.parse_args(argv)
+
+    controller = HandController.from_args(args, title="Calibration")
+    controller.open()
+
+    # The session runs as the only rule of the engine, on every frame the first hand is visible, and
+    # stops the loop once the last step is over. Ctrl+C stops it early.
+    stop = install_stop_handlers()
+    session = CalibrationSession(controller.frame_size, seconds=args.seconds, done=stop)
+    engine = GestureEngine([Profile("calibration", [Rule("sample", [], each_frame=session.update)])], controller.frame_size)
+    controller.run(engine, stop=stop)
+
+    try:
+        calibration = session.result()
+    except ValueError as error:
+        sys.exit("Calibration failed: {}".format(error))
+    calibration.save(args.output)
+    print("{!r} saved to {}".format(calibration, args.output))
@@ -0,0 +1,408 @@
+# Camera negotiation and latency auto-tuning for `cv2.VideoCapture`.
+#
+# A camera opened with `cv2.VideoCapture(0)` runs with whatever the driver picks: often its highest
+# resolution in an uncompressed format such as YUYV, which USB bandwidth limits to a low frame rate,
+# and an internal queue of several frames that adds to the latency. `open_camera()` requests a
+# resolution, frame rate, pixel format (FOURCC, e.g. MJPG) and buffer size, then reads back what the
+# driver actually applied, since drivers silently ignore or round what they do not support.
+#
+# `auto_tune()` goes one step further: it applies a list of candidate settings one after the other,
+# measures the capture-to-result latency of each through the real capture stage and model, and keeps
+# the fastest one that meets a latency and frame rate target. It runs the same way on a video file or
+# a synthetic source, which is how it is checked without a webcam:
+#
+#     python -m handcontrol camera --camera 0 --size 640x480 --fps 30 --fourcc MJPG --buffer-size 1
+#     python -m handcontrol camera --camera synthetic --auto-tune --target-latency 40
+#
+# `virtual_mouse.py`, `virtual_keyboard.py` and `multiproc.py` accept the same `--camera`, `--size`,
+# `--fps`, `--fourcc` and `--buffer-size` options, and `--auto-tune` to run the tuning when they open
+# the camera. The settings it keeps are printed as options, so the next runs can request them directly
+# instead of tuning again.
+
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from .capture import LatestFrameCapture, SyntheticCapture
+
+# Candidate settings tried by `auto_tune()` when none are given, from the most to the least detailed.
+DEFAULT_CANDIDATES = ["1280x720@30:MJPG", "960x540@30:MJPG", "640x480@30:MJPG", "640x480@60:MJPG", "320x240@60:MJPG"]
+
+
+def fourcc_code(name):
+    """
+    Returns the integer code of a four character code such as `"MJPG"`.
+    """
+    return cv2.VideoWriter_fourcc(*name.ljust(4)[:4])
+
+
+def fourcc_name(code):
+    """
+    Returns the four characters of an integer FOURCC code, or `None` when the driver reports none.
+    """
+    code = int(code)
+    if code <= 0:
+        return None
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def parse_size(value):
+    """
+    Parses a size given on the command line as `"WIDTHxHEIGHT"`, e.g. `"640x480"`, into a `(width,
+    height)` tuple. Raises `argparse.ArgumentTypeError` otherwise, so it can be used as an argument type.
+    """
+    try:
+        width, height = value.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid size {!r}, expected WIDTHxHEIGHT, e.g. 640x480".format(value))
+
+
+class CameraSettings:
+    """
+    Capture settings. Every field left to `None` is not requested and left to the driver.
+
+    :param width: Frame width in pixels
+    :param height: Frame height in pixels
+    :param fps: Frame rate
+    :param fourcc: Pixel format as a four character code, e.g. `"MJPG"` or `"YUYV"`
+    :param buffer_size: Number of frames the driver may queue. 1 keeps the latency lowest.
+    """
+
+    FIELDS = ("width", "height", "fps", "fourcc", "buffer_size")
+
+    def __init__(self, width=None, height=None, fps=None, fourcc=None, buffer_size=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parses `"WIDTHxHEIGHT[@FPS][:FOURCC]"`, e.g. `"640x480@30:MJPG"`.
+        """
+        spec, _, fourcc = spec.partition(":")
+        size, _, fps = spec.partition("@")
+        width, height = parse_size(size)
+        return cls(width, height, float(fps) if fps else None, fourcc or None)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __str__(self):
+        text = "{}x{}".format(self.width, self.height)
+        if self.fps:
+            text += "@{:g}".format(self.fps)
+        if self.fourcc:
+            text += ":" + self.fourcc
+        if self.buffer_size:
+            text += " buffer={}".format(self.buffer_size)
+        return text
+
+    def __repr__(self):
+        return "CameraSettings({})".format(", ".join("{}={!r}".format(k, v) for k, v in self.as_dict().items()))
+
+
+def read_settings(cap):
+    """
+    Returns the settings a capture source currently reports.
+    """
+    return CameraSettings(
+        width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        fps=float(cap.get(cv2.CAP_PROP_FPS)),
+        fourcc=fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+        # Backends without a queue to configure, such as video files, report 0 or -1.
+        buffer_size=max(0, int(cap.get(cv2.CAP_PROP_BUFFERSIZE))) or None,
+    )
+
+
+def apply_settings(cap, settings):
+    """
+    Requests `settings` from a capture source and reads back what it applied.
+
+    The pixel format is requested first, as many drivers only offer some resolutions and frame rates in
+    some formats.
+
+    :return: A `(applied, mismatches)` tuple, where `applied` are the settings read back and
+    `mismatches` maps the name of every requested field the driver did not apply to a
+    `(requested, applied)` tuple
+    """
+    if settings.fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(settings.fourcc))
+    if settings.width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings.width)
+    if settings.height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.height)
+    if settings.fps:
+        cap.set(cv2.CAP_PROP_FPS, settings.fps)
+    if settings.buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size)
+
+    applied = read_settings(cap)
+    mismatches = {}
+    for field in CameraSettings.FIELDS:
+        requested, actual = getattr(settings, field), getattr(applied, field)
+        if requested is None:
+            continue
+        if field == "fps":
+            matches = actual is not None and abs(requested - actual) < 0.5
+        elif field == "fourcc":
+            matches = actual is not None and actual.strip().upper() == requested.strip().upper()
+        else:
+            matches = requested == actual
+        if not matches:
+            mismatches[field] = (requested, actual)
+    return applied, mismatches
+
+
+def open_camera(source=0, settings=None, tuning=None):
+    """
+    Opens a camera, a video file or a synthetic source and applies `settings` to it.
+
+    :param source: Camera index, path of a video file, or `"synthetic"` for a `SyntheticCapture` paced
+    like a camera
+    :param settings: `CameraSettings` to request, or `None` to keep the defaults of the driver
+    :param tuning: Options of `auto_tune()` returned by `tuning_from_args()`, to keep the fastest of its
+    candidates instead of `settings`, or `None`
+    :return: A `(cap, applied, mismatches)` tuple, see `apply_settings()`
+    """
+    if source == "synthetic":
+        cap = SyntheticCapture(frames=sys.maxsize, realtime=True)
+    else:
+        cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+    if settings is None:
+        applied, mismatches = read_settings(cap), {}
+    else:
+        applied, mismatches = apply_settings(cap, settings)
+
+    if tuning is not None and cap.isOpened():
+        tuning = dict(tuning)
+        candidates = tuning.pop("candidates")
+        process = hands_processor() if tuning.pop("model", True) else None
+        best, results = auto_tune(cap, candidates, process, **tuning)
+        for candidate, tuned, tuned_mismatches, _ in results:
+            if candidate is best:
+                applied, mismatches = tuned, tuned_mismatches
+                print("Auto-tuned to {}, request it directly with: --size {}x{} --fps {:g} --fourcc {} --buffer-size {}".format(
+                    applied, candidate.width, candidate.height, candidate.fps or applied.fps,
+                    candidate.fourcc or applied.fourcc, candidate.buffer_size or 1,
+                ))
+    return cap, applied, mismatches
+
+
+def add_camera_arguments(parser, source="0", multiple=False):
+    """
+    Adds the `--camera`, `--size`, `--fps`, `--fourcc` and `--buffer-size` options to a parser, read
+    back by `settings_from_args()`, and the `--auto-tune` options read back by `tuning_from_args()`.
+
+    :param source: Camera opened by default
+    :param multiple: Make `--camera` repeatable, its value is then a list, empty by default
+    """
+    if multiple:
+        parser.add_argument("--camera", action="append", default=[], help="camera index, video file or 'synthetic' (repeatable, defaults to {})".format(source))
+    else:
+        parser.add_argument("--camera", default=source, help="camera index, video file or 'synthetic'")
+    parser.add_argument("--size", type=parse_size, help="requested frame size, e.g. 640x480")
+    parser.add_argument("--fps", type=float, help="requested frame rate")
+    parser.add_argument("--fourcc", help="requested pixel format, e.g. MJPG or YUYV")
+    parser.add_argument("--buffer-size", type=int, help="number of frames the driver may queue, 1 for the lowest latency")
+    parser.add_argument("--auto-tune", action="store_true", help="measure the candidate settings when opening the camera and keep the fastest one")
+    parser.add_argument("--candidate", action="append", default=[], help="candidate setting of --auto-tune as WIDTHxHEIGHT[@FPS][:FOURCC] (repeatable)")
+    parser.add_argument("--target-latency", type=float, help="largest acceptable p95 capture-to-result latency of --auto-tune, in milliseconds")
+    parser.add_argument("--min-fps", type=float, help="smallest acceptable frame rate of --auto-tune")
+
+
+def settings_from_args(args):
+    """
+    Returns the `CameraSettings` requested on the command line, or `None` when nothing was requested.
+    """
+    if not (args.size or args.fps or args.fourcc or args.buffer_size):
+        return None
+    width, height = args.size or (None, None)
+    return CameraSettings(width, height, args.fps, args.fourcc, args.buffer_size)
+
+
+def tuning_from_args(args, model=True, frames=60):
+    """
+    Returns the options of `auto_tune()` requested on the command line, passed on to `open_camera()`,
+    or `None` without `--auto-tune`.
+
+    :param model: Measure the latency through the hand model, rather than the capture stage alone
+    :param frames: Number of frames measured per candidate
+    """
+    if not args.auto_tune:
+        return None
+    candidates = []
+    for spec in args.candidate or DEFAULT_CANDIDATES:
+        candidate = CameraSettings.parse(spec)
+        candidate.buffer_size = args.buffer_size or 1
+        candidates.append(candidate)
+    return {
+        "candidates": candidates,
+        "model": model,
+        "target_latency": args.target_latency,
+        "min_fps": args.min_fps,
+        "frames": frames,
+    }
+
+
+def report_settings(applied, mismatches):
+    """
+    Prints the settings applied by the driver and every requested setting it did not apply.
+    """
+    print("Camera: {}".format(applied))
+    for field, (requested, actual) in mismatches.items():
+        print("  {} requested {} but the driver applied {}".format(field, requested, actual))
+
+
+def hands_processor(model_complexity=1, max_num_hands=2):
+    """
+    Returns a function running MediaPipe Hands on a BGR frame the way the main loops do, used as the
+    workload of `measure_latency()`. MediaPipe is only imported when it is called.
+    """
+    import mediapipe as mp
+
+    from .frames import FramePreparer
+
+    hands = mp.solutions.hands.Hands(
+        model_complexity=model_complexity,
+        max_num_hands=max_num_hands,
+        min_detection_confidence=0.8,
+        min_tracking_confidence=0.5,
+    )
+    frames = FramePreparer()
+
+    def process(frame):
+        return hands.process(frames.prepare(frame))
+
+    return process
+
+
+def measure_latency(cap, process=None, frames=60, warmup=10, timeout=2.0):
+    """
+    Runs frames through the capture stage and `process` like the main loops do, and measures the time
+    from the moment every frame was read from the driver to the moment its result was ready.
+
+    :param cap: An opened capture source, left open afterwards
+    :param process: Function called with every frame, e.g. from `hands_processor()`. `None` measures
+    the capture stage alone.
+    :param frames: Number of frames measured
+    :param warmup: Number of frames processed first and left out, while the driver and model settle
+    :return: A dictionary with the frame rate achieved and the mean and p95 latency in milliseconds, or
+    an empty dictionary when the source delivered no frames
+    """
+    capture = LatestFrameCapture(cap).start()
+    latencies = []
+    durations = []
+    start = None
+    try:
+        while len(latencies) < frames:
+            success, frame, timestamp = capture.read(timeout)
+            if not success:
+                if not capture.running:
+                    break
+                continue
+            begin = time.perf_counter()
+            if process is not None:
+                process(frame)
+            end = time.perf_counter()
+
+            if warmup:
+                warmup -= 1
+                start = end
+                continue
+            if start is None:
+                start = end
+            latencies.append(end - timestamp)
+            durations.append(end - begin)
+        stats = capture.stats()
+    finally:
+        capture.stop(release=False)
+
+    if not latencies:
+        return {}
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000.0
+    return {
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms_mean": float(latencies.mean()),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "process_ms_mean": float(np.mean(durations) * 1000.0),
+        "frames_dropped": stats["frames_dropped"],
+    }
+
+
+def auto_tune(cap, candidates, process=None, target_latency=None, min_fps=None, frames=60, warmup=10, log=print):
+    """
+    Measures the latency of every candidate setting and applies the fastest one that meets the target.
+
+    :param cap: An opened capture source
+    :param candidates: List of `CameraSettings` to try
+    :param process: Workload run on every frame, see `measure_latency()`
+    :param target_latency: Largest acceptable p95 capture-to-result latency in milliseconds
+    :param min_fps: Smallest acceptable frame rate
+    :param log: Function called with a line of text for every candidate measured
+    :return: A `(settings, results)` tuple, where `settings` is the candidate kept (the one with the
+    lowest latency overall when none meets the target) and `results` lists `(candidate, applied,
+    mismatches, stats)` for every candidate
+    """
+    results = []
+    for candidate in candidates:
+        applied, mismatches = apply_settings(cap, candidate)
+        stats = measure_latency(cap, process, frames=frames, warmup=warmup)
+        results.append((candidate, applied, mismatches, stats))
+        if stats:
+            log("{:<28} applied {:<28} {:6.1f} fps  latency {:6.1f} ms mean {:6.1f} ms p95".format(
+                str(candidate), str(applied), stats["fps"], stats["latency_ms_mean"], stats["latency_ms_p95"]
+            ))
+        else:
+            log("{:<28} no frames".format(str(candidate)))
+
+    measured = [result for result in results if result[3]]
+    if not measured:
+        return None, results
+
+    def meets(stats):
+        return (target_latency is None or stats["latency_ms_p95"] <= target_latency) and (
+            min_fps is None or stats["fps"] >= min_fps
+        )
+
+    eligible = [result for result in measured if meets(result[3])] or measured
+    best = min(eligible, key=lambda result: result[3]["latency_ms_p95"])
+    if not meets(best[3]):
+        log("No candidate meets the target, keeping the fastest one")
+    apply_settings(cap, best[0])
+    return best[0], results
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Negotiate camera settings and measure their latency.")
+    add_camera_arguments(parser)
+    parser.add_argument("--frames", type=int, default=60, help="number of frames measured per candidate")
+    parser.add_argument("--no-model", action="store_true", help="measure the capture stage alone, without running the model")
+    args = parser.parse_args(argv)
+
+    # With `--auto-tune`, `open_camera()` measures the candidates and keeps the fastest one.
+    tuning = tuning_from_args(args, model=not args.no_model, frames=args.frames)
+    cap, applied, mismatches = open_camera(args.camera, settings_from_args(args), tuning)
+    if not cap.isOpened():
+        sys.exit("Could not open {}".format(args.camera))
+    report_settings(applied, mismatches)
+
+    if tuning is None:
+        process = None if args.no_model else hands_processor()
+        print("Latency: {}".format(measure_latency(cap, process, frames=args.frames)))
+
+    cap.release()
+
+
+if __name__ == "__main__":
+    main()
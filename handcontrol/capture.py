@@ -0,0 +1,295 @@
+# Threaded capture stage shared by `virtual_mouse.py` and `virtual_keyboard.py`.
+#
+# `cap.read()` blocks until the driver hands over a frame, and if the main loop is busy running
+# `hands.process()` the driver keeps queueing frames that are already stale by the time they are
+# read. `LatestFrameCapture` moves the blocking read onto its own thread and keeps only the newest
+# frame in a single lock-protected slot, so the inference/dispatch stage always works on the most
+# recent image and older frames are dropped (and counted) instead of piling up.
+#
+# The frames are read into a small pool of preallocated buffers with `cap.read(image)`, so the driver
+# writes straight into memory that is reused from frame to frame instead of allocating a new array
+# every time. The reader gets a read-only view of its buffer, which stays valid until its next
+# `read()` call.
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class LatestFrameCapture:
+    """
+    Reads frames from a `cv2.VideoCapture`-like source on a background thread and keeps only the
+    newest one.
+
+    :param cap: Any object with `read()`, `get()` and `release()` methods, e.g. `cv2.VideoCapture(0)`
+    :param name: Name given to the capture thread, handy when several cameras are open
+    :param metrics: Optional `Instrumentation` object the time spent in `cap.read()` is recorded in,
+    under the name `capture`
+    :param reuse_buffers: Read into a pool of three reused buffers (the one being written, the one in
+    the slot and the one held by the reader) instead of a new array for every frame
+    """
+
+    def __init__(self, cap, name="capture", metrics=None, reuse_buffers=True):
+        self.cap = cap
+        self.name = name
+        self.metrics = metrics
+        self.reuse_buffers = reuse_buffers
+
+        # The buffer pool is created from the first frame, once its shape is known. `_views` holds a
+        # read-only view of every buffer, handed out to the reader. `_slot_buffer` and `_held_buffer`
+        # are the indices of the buffers in the slot and held by the reader, which the capture thread
+        # must not write into.
+        self._buffers = []
+        self._views = []
+        self._slot_buffer = None
+        self._held_buffer = None
+
+        # The slot holds a single (frame, sequence number, capture timestamp) tuple. `_cond` is
+        # used both as the lock protecting the slot and to wake a reader waiting for a new frame.
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._last_read_seq = 0
+        self._running = False
+        self._thread = None
+
+        # Counters describing how the capture and inference stages keep up with each other.
+        # `frames_dropped` counts frames overwritten before the consumer ever saw them, and
+        # `last_age`/`max_age` measure how old a frame was (in seconds) when it was handed out.
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_consumed = 0
+        self.read_failures = 0
+        self.last_age = 0.0
+        self.max_age = 0.0
+        self.total_age = 0.0
+
+    def start(self):
+        """
+        Starts the capture thread and returns `self` so it can be chained after the constructor.
+        """
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _free_buffer(self):
+        with self._cond:
+            for index in range(len(self._buffers)):
+                if index != self._slot_buffer and index != self._held_buffer:
+                    return index
+        return None
+
+    def _run(self):
+        while self._running:
+            index = self._free_buffer() if self.reuse_buffers else None
+            start = time.perf_counter()
+            if index is None:
+                success, frame = self.cap.read()
+            else:
+                success, frame = self.cap.read(self._buffers[index])
+            timestamp = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.record("capture", timestamp - start)
+
+            if not success:
+                # A file-backed source has reached its end, or the camera went away. Wake any
+                # waiting reader so it can notice that the stream stopped.
+                with self._cond:
+                    self.read_failures += 1
+                    self._running = False
+                    self._cond.notify_all()
+                break
+
+            with self._cond:
+                # The previous frame was never consumed, so it is being replaced unseen.
+                if self._seq > self._last_read_seq:
+                    self.frames_dropped += 1
+
+                if self.reuse_buffers:
+                    if index is None or frame is not self._buffers[index]:
+                        # First frame, or the source changed the size of its frames: the pool is
+                        # (re)built around the new frame.
+                        self._buffers = [frame] + [np.empty_like(frame) for _ in range(2)]
+                        self._views = [buffer.view() for buffer in self._buffers]
+                        for view in self._views:
+                            view.flags.writeable = False
+                        self._held_buffer = None
+                        index = 0
+                    self._slot_buffer = index
+                    frame = self._views[index]
+
+                self._frame = frame
+                self._seq += 1
+                self._timestamp = timestamp
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Returns the newest frame that has not been handed out yet, waiting for one if necessary.
+
+        :param timeout: Maximum number of seconds to wait for a new frame
+        :return: A `(success, frame, timestamp)` tuple. `success` is `False` when no new frame
+        arrived before the timeout or the capture has stopped. `timestamp` is the
+        `time.perf_counter()` value taken right after the frame was read from the source. With
+        `reuse_buffers`, `frame` is read-only and only valid until the next call.
+        """
+        with self._cond:
+            fresh = self._cond.wait_for(
+                lambda: self._seq > self._last_read_seq or not self._running, timeout
+            )
+            if not fresh or self._seq == self._last_read_seq:
+                return False, None, 0.0
+
+            self._last_read_seq = self._seq
+            frame, timestamp = self._frame, self._timestamp
+            self._held_buffer = self._slot_buffer
+
+            age = time.perf_counter() - timestamp
+            self.frames_consumed += 1
+            self.last_age = age
+            self.max_age = max(self.max_age, age)
+            self.total_age += age
+
+        return True, frame, timestamp
+
+    @property
+    def running(self):
+        return self._running
+
+    def stats(self):
+        """
+        Returns a dictionary with the capture counters, used to check that the inference stage is
+        working on fresh frames.
+        """
+        with self._cond:
+            consumed = self.frames_consumed
+            return {
+                "frames_captured": self.frames_captured,
+                "frames_consumed": consumed,
+                "frames_dropped": self.frames_dropped,
+                "read_failures": self.read_failures,
+                "last_age_ms": self.last_age * 1000.0,
+                "mean_age_ms": (self.total_age / consumed) * 1000.0 if consumed else 0.0,
+                "max_age_ms": self.max_age * 1000.0,
+            }
+
+    def stop(self, release=True):
+        """
+        Stops the capture thread and releases the underlying capture source, unless `release` is
+        `False`, e.g. to try other settings on the same camera.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if release:
+            self.cap.release()
+
+
+class SyntheticCapture:
+    """
+    A `cv2.VideoCapture` stand-in that produces a fixed number of generated frames, so the pipeline
+    can be run without a webcam.
+
+    :param frames: Number of frames returned before `read()` starts failing, like the end of a file
+    :param width: Width of the generated frames in pixels
+    :param height: Height of the generated frames in pixels
+    :param fps: Frame rate reported through `cv2.CAP_PROP_FPS`. When `realtime` is set, `read()` also
+    sleeps to keep to this rate, like a camera would.
+    :param realtime: Pace `read()` to `fps` instead of returning frames as fast as possible
+
+    Like a camera, it accepts new frame sizes and frame rates through `set()`, and records the FOURCC
+    and buffer size it is given, so the negotiation in `camera.py` can be exercised without one.
+    """
+
+    def __init__(self, frames=300, width=640, height=480, fps=30.0, realtime=False):
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+        self.position = 0
+        self.fourcc = cv2.VideoWriter_fourcc(*"BGR3")
+        self.buffer_size = 1
+        self._next_time = None
+        self._generate()
+
+    def _generate(self):
+        width, height = self.width, self.height
+
+        # A handful of frames (a gradient with a bright square moving across it) are generated up
+        # front and cycled, so producing a frame costs about as much as a driver copying one out.
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        base = np.dstack([np.tile(gradient, (height, 1))] * 3)
+        self._pool = []
+        for i in range(8):
+            frame = base.copy()
+            x = (i * width) // 8
+            frame[height // 3 : height // 3 + height // 6, x : x + width // 8] = 255
+            self._pool.append(frame)
+
+    def isOpened(self):
+        return self.position < self.frames
+
+    def read(self, image=None):
+        """
+        Returns the next frame like `cv2.VideoCapture.read()`, copied into `image` when it is given and
+        has the right shape.
+        """
+        if self.position >= self.frames:
+            return False, None
+
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next_time is None:
+                self._next_time = now
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += 1.0 / self.fps
+
+        frame = self._pool[self.position % len(self._pool)]
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            frame = image
+        else:
+            frame = frame.copy()
+        self.position += 1
+        return True, frame
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: float(self.width),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(self.height),
+            cv2.CAP_PROP_FPS: float(self.fps),
+            cv2.CAP_PROP_FRAME_COUNT: float(self.frames),
+            cv2.CAP_PROP_POS_FRAMES: float(self.position),
+            cv2.CAP_PROP_FOURCC: float(self.fourcc),
+            cv2.CAP_PROP_BUFFERSIZE: float(self.buffer_size),
+        }.get(prop, 0.0)
+
+    def set(self, prop, value):
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                self.width = int(value)
+            else:
+                self.height = int(value)
+            self._generate()
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = float(value)
+        elif prop == cv2.CAP_PROP_FOURCC:
+            self.fourcc = int(value)
+        elif prop == cv2.CAP_PROP_BUFFERSIZE:
+            self.buffer_size = int(value)
+        else:
+            return False
+        return True
+
+    def release(self):
+        self.position = self.frames
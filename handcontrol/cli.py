@@ -0,0 +1,48 @@
+# Command line entry point of the package, installed as the `handcontrol` command and also run with
+# `python -m handcontrol`:
+#
+#     handcontrol mouse --filter one-euro --media-keys
+#     handcontrol keyboard --camera synthetic --headless
+#     handcontrol multiproc --camera 0 --profile mouse --profile keyboard:0:1
+#     handcontrol benchmark --synthetic 300 --synthetic-hands
+#     handcontrol camera --camera 0 --auto-tune
+#     handcontrol events 127.0.0.1:8765
+#     handcontrol replay session.hcrec
+#     handcontrol calibrate
+#
+# The first argument selects the command and the remaining ones are passed to its `main()`. The module
+# of the command is only imported once it is selected, so e.g. `handcontrol events` never loads
+# MediaPipe.
+
+import argparse
+import importlib
+
+# Module running every command, and the help shown for it.
+COMMANDS = {
+    "mouse": ("virtual_mouse", "control the mouse cursor with hand gestures"),
+    "keyboard": ("virtual_keyboard", "control media playback with hand gestures"),
+    "multiproc": ("multiproc", "run capture, inference and the gestures in separate processes"),
+    "benchmark": ("benchmark", "benchmark the pipeline on video files or synthetic frames"),
+    "camera": ("camera", "show and auto-tune the camera settings"),
+    "events": ("events", "print the messages published by an --events server"),
+    "replay": ("recording", "replay a --record file through the gesture logic"),
+    "calibrate": ("calibration", "measure the pinch threshold and active region of the mouse"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="handcontrol",
+        description="Hand gesture control of the mouse and media playback.",
+        epilog="\n".join("  {:<10} {}".format(name, help) for name, (_, help) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=list(COMMANDS), help="command to run, see below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="options of the command, see `handcontrol COMMAND --help`")
+    args = parser.parse_args(argv)
+
+    # Only the module of the selected command is imported. Its `main()` exits with an error status
+    # itself when it fails, and what it returns (e.g. the report of `benchmark`) is not an exit status.
+    # `prog` names the command in its usage and errors, which would otherwise show `__main__.py`.
+    module = importlib.import_module("." + COMMANDS[args.command][0], __package__)
+    module.main(args.args, prog="{} {}".format(parser.prog, args.command))
@@ -0,0 +1,399 @@
+# The main loop shared by `virtual_mouse.py` and `virtual_keyboard.py`.
+#
+# Both scripts used to repeat the same loop in their `main()`: open the camera, build the model, read
+# the frames, run the model, evaluate the gestures and draw the preview, with MediaPipe imported as
+# soon as the module was. `HandController` is that loop as an object, which the scripts, the benchmark
+# and other programs create with explicit options, so importing the package costs nothing and nothing
+# runs until `open()` and `run()` are called.
+#
+# Startup is the other reason for it. MediaPipe takes about a second to import and its first
+# `process()` call initialises the graph, while opening a webcam can take as long, and both used to
+# run one after the other. `open()` imports MediaPipe, builds the model and runs it once on a blank
+# frame on a background thread while the camera opens on the calling thread, and `run()` only waits
+# for that thread before reading the first frame. The time from the import of the package to the
+# first processed frame is recorded in `startup` and reported with the other statistics.
+
+import sys
+import threading
+import time
+
+import numpy as np
+
+from . import IMPORTED
+from .camera import add_camera_arguments, open_camera, report_settings, settings_from_args, tuning_from_args
+from .capture import LatestFrameCapture
+from .display import PreviewWindow, install_stop_handlers
+from .events import EventServer
+from .frames import FramePreparer
+from .governor import GovernedHands, QualityGovernor, add_governor_arguments, frame_interval, governor_from_args
+from .instrumentation import AllocationMeter, Instrumentation, SnapshotExporter
+from .landmarks import handedness_labels, landmarks_to_array, mirror_landmarks
+from .recording import Recorder
+from .roi import RoiHands
+
+
+def add_controller_arguments(parser):
+    """
+    Adds the options of `HandController` to an `argparse` parser, read back by
+    `HandController.from_args()`.
+    """
+    add_camera_arguments(parser)
+    add_governor_arguments(parser)
+    parser.add_argument("--roi", action="store_true", help="run inference on a downscaled crop around the tracked hand")
+    parser.add_argument("--roi-size", type=int, default=256, help="longest side of the crop after downscaling, in pixels")
+    parser.add_argument("--headless", action="store_true", help="run without any window nor drawing, stop with Ctrl+C or SIGTERM")
+    parser.add_argument("--preview-every", type=int, default=1, help="only render the preview window for one frame out of this many")
+    parser.add_argument("--preview-scale", type=float, default=1.0, help="draw and show the preview on a copy scaled by this factor")
+    parser.add_argument("--events", help="publish the landmarks and gesture events to local subscribers on unix:PATH, HOST:PORT or PORT (see events.py)")
+    parser.add_argument("--events-queue", type=int, default=64, help="messages queued for every --events subscriber before the oldest ones are dropped")
+    parser.add_argument("--record", help="append the landmarks, handedness and gesture events of every frame to this file (see recording.py)")
+    parser.add_argument("--metrics", help="file the stage timings and counters are periodically written to, as JSON")
+    parser.add_argument("--allocations", action="store_true", help="measure the memory allocated for every frame (slows the loop down)")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="seconds between two metrics snapshots")
+
+
+def draw_hand_landmarks(image, hand_landmarks):
+    """
+    Draws the landmarks and the connections between them of every detected hand with the MediaPipe
+    drawing utilities.
+
+    :param image: The image the landmarks are drawn on
+    :param hand_landmarks: The `results.multi_hand_landmarks` list returned by `hands.process()`
+    """
+    if hand_landmarks:
+        from mediapipe.python.solutions import drawing_utils, hands
+
+        for landmarks in hand_landmarks:
+            drawing_utils.draw_landmarks(image, landmarks, hands.HAND_CONNECTIONS)
+
+
+class HandController:
+    """
+    Runs the camera, the hand model and a gesture engine together.
+
+    :param camera: Camera index, video file or `"synthetic"`, see `open_camera()`
+    :param settings: `CameraSettings` requested from the camera, or `None` for the driver defaults
+    :param tuning: Options of `auto_tune()` run when the camera is opened, see `tuning_from_args()`
+    :param governor: `QualityGovernor` choosing the settings of the model, see `governor.py`
+    :param roi: Run the model on a downscaled crop around the tracked hand, see `roi.py`
+    :param roi_size: Longest side of the crop after downscaling, in pixels
+    :param events: Address the landmarks and gesture events are published on, see `events.py`
+    :param events_queue: Messages queued for every subscriber of `events`
+    :param record: File the landmarks and gesture events of every frame are recorded to, see
+    `recording.py`
+    :param headless: Never draw nor open a window
+    :param preview_every: Only render the preview for one frame out of this many
+    :param preview_scale: Scale of the preview
+    :param title: Title of the preview window
+    :param metrics: `Instrumentation` object the stage timings are recorded in
+    :param metrics_file: File the metrics are periodically written to, as JSON
+    :param metrics_interval: Seconds between two metrics snapshots
+    :param allocations: Measure the memory allocated for every frame
+    """
+
+    def __init__(self, camera="0", settings=None, tuning=None, governor=None, roi=False, roi_size=256, events=None,
+                 events_queue=64, record=None, headless=False, preview_every=1, preview_scale=1.0,
+                 title="Media Controller", metrics=None, metrics_file=None, metrics_interval=5.0,
+                 allocations=False):
+        self.camera = camera
+        self.settings = settings
+        self.tuning = tuning
+        self.governor = governor if governor is not None else QualityGovernor(None, enabled=False)
+        self.roi = roi
+        self.roi_size = roi_size
+        self.events_address = events
+        self.events_queue = events_queue
+        self.record_path = record
+        self.headless = headless
+        self.preview_every = preview_every
+        self.preview_scale = preview_scale
+        self.title = title
+        self.metrics = metrics if metrics is not None else Instrumentation()
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.allocations = AllocationMeter(allocations)
+
+        self.hands = GovernedHands(self.governor, self._make_hands, RoiHands(None, None, roi_size=roi_size) if roi else None)
+        self.applied = None
+        self.frame_size = None
+        self.capture = None
+        self.preview = None
+        self.events = None
+        self.recorder = None
+        self.engine = None
+        self._cap = None
+        self._warmup = None
+        self._warmup_error = None
+
+        # Statistics of the objects the caller adds, e.g. its dispatchers, exported with the metrics
+        # and reported by `report()` under their label.
+        self._extra_stats = []
+
+        # Milliseconds from the import of the package to the camera being open, the model being ready
+        # and the first frame being processed.
+        self.startup = {}
+
+    @classmethod
+    def from_args(cls, args, min_hands=1, **kwargs):
+        """
+        Creates a controller from the options added by `add_controller_arguments()`.
+
+        :param min_hands: Number of hands the gesture profiles need
+        """
+        return cls(
+            camera=args.camera,
+            settings=settings_from_args(args),
+            tuning=tuning_from_args(args),
+            governor=governor_from_args(args, min_hands=min_hands),
+            roi=args.roi,
+            roi_size=args.roi_size,
+            events=args.events,
+            events_queue=args.events_queue,
+            record=args.record,
+            headless=args.headless,
+            preview_every=args.preview_every,
+            preview_scale=args.preview_scale,
+            metrics_file=args.metrics,
+            metrics_interval=args.metrics_interval,
+            allocations=args.allocations,
+            **kwargs
+        )
+
+    def add_stats(self, label, stats):
+        """
+        Adds a function returning statistics, e.g. `dispatcher.stats`, to the ones exported and reported.
+        """
+        self._extra_stats.append((label, stats))
+
+    def _make_hands(self, model_complexity, max_num_hands):
+        # MediaPipe is only imported here, on the warm-up thread of `open()`.
+        from mediapipe.python.solutions import hands as mp_hands
+
+        # The `Hands` class from the `mp.solutions.hands` module of the Mediapipe library detects the
+        # hand landmarks in the video frames. Hands detected with a confidence below 0.8, or tracked
+        # from the previous frame with a confidence below 0.5, are not reported.
+        return mp_hands.Hands(
+            model_complexity=model_complexity,
+            max_num_hands=max_num_hands,
+            min_detection_confidence=0.8,
+            min_tracking_confidence=0.5,
+        )
+
+    def _warm_up(self, size):
+        try:
+            # The first `process()` call initialises the graph, so it is made on a blank frame of the
+            # requested size rather than on the first camera frame.
+            self.hands.process(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+        except BaseException as error:
+            self._warmup_error = error
+        self.startup["model_ready_ms"] = (time.perf_counter() - IMPORTED) * 1000.0
+
+    def open(self):
+        """
+        Opens the camera while the model is warmed up in the background, and returns the
+        `CameraSettings` applied by the driver. `frame_size` is set from them.
+        """
+        size = (640, 480)
+        if self.settings is not None and self.settings.width and self.settings.height:
+            size = (self.settings.width, self.settings.height)
+        self._warmup = threading.Thread(target=self._warm_up, args=(size,), name="model-warmup", daemon=True)
+        self._warmup.start()
+
+        # `open_camera()` opens the camera (the default camera, index 0, unless told otherwise),
+        # requests the resolution, frame rate, pixel format and driver buffer size, and reads back what
+        # the driver actually applied. With `--auto-tune` it first measures the candidate settings
+        # and keeps the fastest one.
+        self._cap, self.applied, mismatches = open_camera(self.camera, self.settings, self.tuning)
+        self.startup["camera_open_ms"] = (time.perf_counter() - IMPORTED) * 1000.0
+        # A missing camera or file opens without error, with a size of -1x-1 that the screen mapping
+        # cannot divide by.
+        if not self._cap.isOpened() or self.applied.width <= 0 or self.applied.height <= 0:
+            self._cap.release()
+            sys.exit("Could not open {}".format(self.camera))
+        report_settings(self.applied, mismatches)
+
+        self.frame_size = (self.applied.width, self.applied.height)
+        if self.governor.budget is None:
+            self.governor.budget = frame_interval(self.applied.fps)
+        return self.applied
+
+    def run(self, engine, overlay=None, stop=None):
+        """
+        Runs the main loop until `stop` is set, the camera runs out of frames or ESC is pressed in the
+        preview window.
+
+        :param engine: The `GestureEngine` evaluated on the landmarks of every frame
+        :param overlay: Optional function called with the mirrored preview image and the landmark array,
+        to draw on top of the landmarks
+        :param stop: `threading.Event` stopping the loop, by default one set on Ctrl+C or SIGTERM
+        """
+        if self._cap is None:
+            self.open()
+        self.engine = engine
+        metrics = self.metrics
+
+        self._warmup.join()
+        if self._warmup_error is not None:
+            raise self._warmup_error
+
+        # `LatestFrameCapture` reads the camera on its own thread and only keeps the newest frame, so
+        # the loop below (the inference/dispatch stage) never works on a frame that queued up while the
+        # previous one was being processed.
+        self.capture = capture = LatestFrameCapture(self._cap, metrics=metrics).start()
+
+        # `preview` decides which frames are drawn and shown: none when headless, otherwise one out of
+        # every `preview_every`, on a copy scaled by `preview_scale`. The gesture control below runs on
+        # every frame regardless. `stop` is set on Ctrl+C or SIGTERM, so the loop can also be stopped
+        # without the ESC key in the window.
+        self.preview = preview = PreviewWindow(self.title, self.headless, self.preview_every, self.preview_scale)
+        if stop is None:
+            stop = install_stop_handlers()
+
+        # `frames` converts every frame to the RGB image the model expects, into a buffer reused for
+        # every frame, and `allocations` measures how much memory every frame allocates when enabled.
+        frames = FramePreparer()
+        allocations = self.allocations.start()
+
+        # `events` publishes the landmarks of every frame and the gesture events of the engine to the
+        # programs subscribed to a local socket, from its own thread.
+        if self.events_address:
+            self.events = EventServer(self.events_address, queue_size=self.events_queue).start()
+            engine.listeners.append(self.events.gesture_listener)
+            # With port 0 the port is only known once the server listens, and subscribers need it.
+            if self.events.family == "unix":
+                print("Publishing events on unix:{}".format(self.events.target))
+            else:
+                print("Publishing events on {}:{}".format(self.events.target[0], self.events.port))
+        events = self.events
+
+        # `recorder` appends what the gesture logic received and decided on every frame to a file that
+        # can be replayed and analysed later.
+        if self.record_path:
+            self.recorder = Recorder(self.record_path, engine, self.frame_size, metadata={"camera": str(self.applied)})
+        recorder = self.recorder
+
+        # With a metrics file, a `SnapshotExporter` thread writes the stage timings, together with the
+        # counters of the other stages, to a JSON file every `metrics_interval` seconds.
+        exporter = None
+        if self.metrics_file:
+            exporter = SnapshotExporter(metrics, self.metrics_file, self.metrics_interval, collect=self._collect).start()
+
+        hands = self.hands
+        governor = self.governor
+        try:
+            while not stop.is_set():
+                # Every stage of the loop is timed into its own histogram with `metrics.time()`
+                with metrics.time("capture_wait"):
+                    success, image, frame_time = capture.read()
+                if not success:
+                    if not capture.running:
+                        break
+                    continue
+                metrics.record("frame_age", time.perf_counter() - frame_time)
+                metrics.count("frames")
+                allocations.tick()
+
+                # At the lightest quality levels the model only runs on one frame out of two or three.
+                if not governor.due():
+                    continue
+                work_start = time.perf_counter()
+
+                # The frame is converted to RGB into a reused, read-only buffer. It is not flipped: the
+                # landmarks are mirrored below instead, so the hand still moves like in a mirror.
+                with metrics.time("prepare"):
+                    rgb_image = frames.prepare(image)
+
+                # Detect the Hands Landmarks
+                with metrics.time("process"):
+                    results = hands.process(rgb_image)
+
+                # The landmarks of every detected hand are copied once into a `(hands, 21, 3)` array
+                # that the gesture logic evaluates for every hand at once.
+                with metrics.time("landmarks"):
+                    hand_landmarks = results.multi_hand_landmarks
+                    hands_array = mirror_landmarks(landmarks_to_array(hand_landmarks))
+                    handedness = handedness_labels(results.multi_handedness, len(hands_array))
+                if events is not None:
+                    events.publish_landmarks(hands_array, frame_time)
+
+                with metrics.time("gesture"):
+                    engine.update(hands_array, frame_time, handedness)
+                if recorder is not None:
+                    with metrics.time("record"):
+                        recorder.write(hands_array, frame_time, results.multi_handedness)
+                governor.record(time.perf_counter() - work_start)
+                if "first_frame_ms" not in self.startup:
+                    self.startup["first_frame_ms"] = (time.perf_counter() - IMPORTED) * 1000.0
+
+                if not preview.due():
+                    continue
+
+                # The MediaPipe landmarks are in camera coordinates, so they are drawn before the preview
+                # is mirrored, and the overlay is drawn from the mirrored landmarks.
+                with metrics.time("draw"):
+                    preview_image = preview.prepare(image)
+                    draw_hand_landmarks(preview_image, hand_landmarks)
+                    preview.mirror(preview_image)
+                    if overlay is not None:
+                        overlay(preview_image, hands_array)
+
+                # Quit the window on pressing the ESC key
+                with metrics.time("display"):
+                    key = preview.show(preview_image)
+                if key == 27:
+                    break
+        finally:
+            # The camera, the background threads and the preview window are closed at the end of the
+            # loop. `preview.close()` calls `cv2.destroyAllWindows()` to close any open windows.
+            capture.stop()
+            if events is not None:
+                events.stop()
+            if recorder is not None:
+                recorder.close()
+            if exporter is not None:
+                exporter.stop()
+            allocations.stop()
+            hands.close()
+            preview.close()
+
+        # A source that opens but fails on its first read, e.g. a camera already in use, ends the loop
+        # right away.
+        if capture.read_failures and not capture.frames_captured:
+            sys.exit("Could not read a frame from {}".format(self.camera))
+
+    def _collect(self):
+        metrics = self.metrics
+        metrics.update("startup", self.startup)
+        metrics.update("capture", self.capture.stats())
+        for label, stats in self._extra_stats:
+            metrics.update(label.lower(), stats())
+        metrics.update("preview", self.preview.stats())
+        metrics.update("allocations", self.allocations.stats())
+        metrics.update("quality", self.governor.stats())
+        if self.events is not None:
+            metrics.update("events", self.events.stats())
+        if self.recorder is not None:
+            metrics.update("recording", self.recorder.stats())
+
+    def report(self):
+        """
+        Prints the statistics of the last run: the startup times, how many frames the inference stage
+        skipped and how old the frames it used were, and the timings of every stage.
+        """
+        print("Startup Stats: ", {key: round(value, 1) for key, value in self.startup.items()})
+        print("Capture Stats: ", self.capture.stats())
+        for label, stats in self._extra_stats:
+            print("{} Stats: ".format(label), stats())
+        print("Gesture Stats: ", self.engine.stats())
+        if self.roi:
+            print("ROI Stats: ", self.hands.roi.stats())
+        if self.events is not None:
+            print("Event Stats: ", self.events.stats())
+        if self.recorder is not None:
+            print("Recording Stats: ", self.recorder.stats())
+        if self.governor.enabled:
+            print("Quality Stats: ", self.governor.stats())
+        if self.allocations.enabled:
+            print("Allocation Stats: ", self.allocations.stats())
+        for stage, summary in self.metrics.snapshot()["stages"].items():
+            print("Stage {}: ".format(stage), summary)
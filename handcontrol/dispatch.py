@@ -0,0 +1,183 @@
+# Asynchronous input dispatch for the pynput controllers.
+#
+# Moving the cursor or pressing a key through pynput is a synchronous round-trip to the OS, and the
+# vision loop used to make several of them per frame. `InputDispatcher` wraps a pynput controller with
+# the same `position`, `press()`, `release()` and `tap()` members, but only puts the events on a
+# bounded queue that a dedicated thread sends to the controller. Consecutive cursor moves are coalesced
+# into the latest one, taps are sent as a press immediately followed by a release, and per-key rate
+# limits stop a held gesture from flooding the OS with repeats.
+
+import queue
+import threading
+import time
+from collections import Counter
+
+
+class InputDispatcher:
+    """
+    Sends mouse and keyboard events to a controller from a background thread.
+
+    :param controller: A `pynput.mouse.Controller` or `pynput.keyboard.Controller`, or any object with
+    the same members
+    :param maxsize: Capacity of the event queue. Taps are dropped (and counted) when it is full, while
+    presses and releases wait for room so a button is never left held down.
+    :param rate_limits: Maximum number of taps per second for individual keys or buttons, e.g.
+    `{Key.left: 5, Key.right: 5}`. Taps arriving faster are skipped and counted as rate limited.
+    :param metrics: Optional `Instrumentation` object the time spent in the controller calls is
+    recorded in, under the name `dispatch`
+    """
+
+    def __init__(self, controller, maxsize=64, rate_limits=None, metrics=None):
+        self.controller = controller
+        self.metrics = metrics
+        self.rate_limits = dict(rate_limits or {})
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # The latest requested cursor position. A "move" token is only queued when no move is pending,
+        # and later moves just replace the position, so the thread always jumps to the newest one.
+        self._pending_move = None
+        self._position = None
+        self._last_tap = {}
+        self._held = set()
+
+        # `submitted` counts every event requested, `emitted` the ones sent to the controller, and
+        # `coalesced`, `rate_limited` and `dropped` the ones that were not sent and why. `failed` counts
+        # the events the controller raised an exception for.
+        self.counters = Counter()
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="input-dispatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    # Controller interface used by `countFingers()`
+
+    @property
+    def position(self):
+        with self._lock:
+            if self._position is not None:
+                return self._position
+        return self.controller.position
+
+    @position.setter
+    def position(self, value):
+        with self._lock:
+            self.counters["submitted"] += 1
+            self._position = value
+            if self._pending_move is not None:
+                self._pending_move = value
+                self.counters["coalesced"] += 1
+                return
+            self._pending_move = value
+
+        try:
+            self._queue.put_nowait(("move", None, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._pending_move = None
+                self.counters["dropped"] += 1
+
+    def press(self, key):
+        """
+        Presses and holds `key` (or a mouse button) until `release()` is called for it.
+        """
+        self._submit("press", key, block=True)
+
+    def release(self, key):
+        self._submit("release", key, block=True)
+
+    def tap(self, key):
+        """
+        Presses and releases `key`, unless its rate limit was reached.
+        """
+        limit = self.rate_limits.get(key)
+        now = time.perf_counter()
+        with self._lock:
+            if limit:
+                last = self._last_tap.get(key)
+                if last is not None and now - last < 1.0 / limit:
+                    self.counters["submitted"] += 1
+                    self.counters["rate_limited"] += 1
+                    return
+                self._last_tap[key] = now
+        self._submit("tap", key, block=False)
+
+    def _submit(self, kind, key, block):
+        with self._lock:
+            self.counters["submitted"] += 1
+        try:
+            self._queue.put((kind, key, time.perf_counter()), block=block)
+        except queue.Full:
+            with self._lock:
+                self.counters["dropped"] += 1
+
+    # Dispatcher thread
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            kind, key, queued = item
+            start = time.perf_counter()
+            # An exception from the controller must not end the thread: the vision loop would then
+            # block on the next press or release once the queue is full.
+            try:
+                if kind == "move":
+                    with self._lock:
+                        position, self._pending_move = self._pending_move, None
+                    if position is None:
+                        continue
+                    self.controller.position = position
+                elif kind == "press":
+                    self.controller.press(key)
+                    self._held.add(key)
+                elif kind == "release":
+                    self.controller.release(key)
+                    self._held.discard(key)
+                elif kind == "tap":
+                    self.controller.press(key)
+                    self.controller.release(key)
+            except Exception as error:
+                with self._lock:
+                    self.counters["failed"] += 1
+                    first = self.counters["failed"] == 1
+                if first:
+                    print("Input dispatcher: {} {} failed: {!r}".format(kind, key, error))
+                continue
+
+            end = time.perf_counter()
+            latency = end - queued
+            if self.metrics is not None:
+                self.metrics.record("dispatch", end - start)
+            with self._lock:
+                self.counters["emitted"] += 1
+                self.counters["emitted_" + kind] += 1
+                self.max_latency = max(self.max_latency, latency)
+                self.total_latency += latency
+
+    def stop(self):
+        """
+        Sends the events still queued, releases anything left held down and stops the thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        for key in list(self._held):
+            self.controller.release(key)
+        self._held.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            emitted = self.counters["emitted"]
+            stats["mean_latency_ms"] = (self.total_latency / emitted) * 1000.0 if emitted else 0.0
+            stats["max_latency_ms"] = self.max_latency * 1000.0
+            return stats
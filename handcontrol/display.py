@@ -0,0 +1,96 @@
+# Preview window and shutdown handling for the main loops.
+#
+# Drawing the landmarks and the pinch overlay, `cv2.imshow()` and `cv2.waitKey()` cost time on every
+# frame even on machines where nobody watches the window. `PreviewWindow` decides which frames are
+# rendered: none at all in headless mode, or one frame out of every `every`, optionally on a
+# downscaled copy. The gesture control itself keeps running on every frame. Since the camera frames
+# are read-only and no longer mirrored (see `frames.py`), the preview is drawn on a buffer reused from
+# frame to frame and mirrored in place only when it is shown. `install_stop_handlers()`
+# lets the loops shut down cleanly on Ctrl+C or SIGTERM, since there is no ESC key to press without a
+# window.
+
+import signal
+import threading
+
+import cv2
+
+from .frames import FrameScaler
+
+
+class PreviewWindow:
+    """
+    Renders the preview window for a subset of the frames.
+
+    :param name: Title of the window
+    :param headless: Never draw nor call any OpenCV GUI function
+    :param every: Render one frame out of this many
+    :param scale: Scale of the copy the overlays are drawn on and shown
+    :param mirror: Flip the preview horizontally in `mirror()`, so it shows the user as in a mirror
+    """
+
+    def __init__(self, name="Media Controller", headless=False, every=1, scale=1.0, mirror=True):
+        self.name = name
+        self.headless = headless
+        self.every = max(1, every)
+        self.scale = scale
+        self.mirror_image = mirror
+        self.frames = 0
+        self.rendered = 0
+        self._scaler = FrameScaler(cv2.INTER_NEAREST)
+
+    def due(self):
+        """
+        Returns whether the current frame should be rendered. Must be called once per frame.
+        """
+        self.frames += 1
+        if self.headless or (self.frames - 1) % self.every:
+            return False
+        self.rendered += 1
+        return True
+
+    def prepare(self, image):
+        """
+        Returns a writable copy of `image`, downscaled when `scale` is below 1.0, for the overlays to be
+        drawn on. The copy is written into the same buffer on every call.
+        """
+        return self._scaler.scale(image, self.scale, copy=True)
+
+    def mirror(self, image):
+        """
+        Flips the prepared image horizontally in place. Overlays drawn from landmarks in camera
+        coordinates (the MediaPipe results) go before it, and overlays drawn from mirrored landmarks
+        after it.
+        """
+        if self.mirror_image:
+            cv2.flip(image, 1, dst=image)
+        return image
+
+    def show(self, image):
+        """
+        Shows `image` in the window and returns the code of the key pressed, or -1.
+        """
+        cv2.imshow(self.name, image)
+        return cv2.waitKey(1)
+
+    def close(self):
+        if not self.headless and self.rendered:
+            cv2.destroyAllWindows()
+
+    def stats(self):
+        return {"frames": self.frames, "rendered": self.rendered}
+
+
+def install_stop_handlers():
+    """
+    Makes SIGINT (Ctrl+C) and SIGTERM set the returned `threading.Event` instead of interrupting the
+    loop, so it can finish the current frame, release held buttons and close the camera.
+    """
+    stop = threading.Event()
+
+    def handler(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handler)
+    return stop
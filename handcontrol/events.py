@@ -0,0 +1,340 @@
+# Gesture event server for local consumers.
+#
+# The only output of the loops used to be the pynput controllers, so every other program interested in
+# the hands needed its own camera loop and its own `hands.process()` run. `EventServer` publishes the
+# landmark arrays and the gesture events of one pipeline over a local TCP or UNIX socket, from an
+# asyncio loop running on its own thread, to any number of subscribers. Every subscriber has a bounded
+# queue: when a client reads too slowly the oldest frames are dropped (and counted) so the client
+# always catches up with the newest ones and never slows the vision loop down. Landmark frames are
+# dropped first, since the next one replaces them, while a lost gesture event, say the end of a pinch,
+# would leave the client with a gesture that never ends. Events are only dropped from a queue that
+# holds nothing else.
+#
+# Every message is a 16-byte little-endian header followed by a payload:
+#
+#     kind    uint8    KIND_LANDMARKS or KIND_EVENT
+#     arg     uint8    number of hands for landmarks, index of the hand for events
+#     length  uint16   length of the payload in bytes
+#     seq     uint32   sequence number of the message, gaps show the messages dropped for this client
+#     time    float64  capture time of the frame, in `time.perf_counter()` seconds of the server
+#
+# The payload of KIND_LANDMARKS is the `(hands, 21, 3)` float32 array of `landmarks_to_array()`, and
+# the payload of KIND_EVENT is one byte (1 when the gesture starts, 0 when it ends) followed by the
+# ASCII name of the gesture, `profile.rule`: `mouse.pinch` for pinch down and up, and `keyboard.play`,
+# `keyboard.pause`, `keyboard.seek_backward` and `keyboard.seek_forward` for the media controls.
+#
+# Run `python -m handcontrol events ADDRESS` to print what a running `--events ADDRESS` loop publishes, e.g.
+#
+#     python -m handcontrol keyboard --camera synthetic --headless --events 127.0.0.1:8765
+#     python -m handcontrol events 127.0.0.1:8765
+
+import argparse
+import asyncio
+import os
+import stat
+import struct
+import threading
+from collections import Counter, deque
+
+import numpy as np
+
+from .landmarks import NUM_LANDMARKS
+
+HEADER = struct.Struct("<BBHId")
+
+KIND_LANDMARKS = 1
+KIND_EVENT = 2
+
+EDGES = {"enter": 1, "exit": 0}
+
+
+def parse_address(address):
+    """
+    Parses `unix:PATH`, `HOST:PORT` or `PORT` (on 127.0.0.1) into `("unix", path)` or
+    `("tcp", (host, port))`.
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def encode_landmarks(hands_array, timestamp, seq=0):
+    """
+    Encodes a `(hands, 21, 3)` landmark array into a KIND_LANDMARKS message.
+    """
+    payload = np.ascontiguousarray(hands_array, dtype="<f4").tobytes()
+    return HEADER.pack(KIND_LANDMARKS, len(hands_array), len(payload), seq, timestamp) + payload
+
+
+def encode_event(name, hand, edge, timestamp, seq=0):
+    """
+    Encodes a gesture event into a KIND_EVENT message.
+
+    :param name: Name of the gesture, `profile.rule`
+    :param edge: `"enter"` when the gesture starts, `"exit"` when it ends
+    """
+    payload = bytes((EDGES[edge],)) + name.encode("ascii")
+    return HEADER.pack(KIND_EVENT, hand, len(payload), seq, timestamp) + payload
+
+
+def decode_payload(kind, arg, payload):
+    """
+    Decodes the payload of a message: the landmark array for KIND_LANDMARKS, and a `(name, edge)`
+    tuple for KIND_EVENT.
+    """
+    if kind == KIND_LANDMARKS:
+        return np.frombuffer(payload, dtype="<f4").reshape(arg, NUM_LANDMARKS, 3)
+    if kind == KIND_EVENT:
+        return payload[1:].decode("ascii"), "enter" if payload[0] else "exit"
+    raise ValueError("Unknown message kind {}".format(kind))
+
+
+async def read_message(reader):
+    """
+    Reads the next message from an `asyncio.StreamReader`.
+
+    :return: A `(kind, arg, seq, timestamp, payload)` tuple with the payload decoded by
+    `decode_payload()`
+    """
+    kind, arg, length, seq, timestamp = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length)
+    return kind, arg, seq, timestamp, decode_payload(kind, arg, payload)
+
+
+async def subscribe(address):
+    """
+    Connects to an `EventServer` and yields its messages as returned by `read_message()` until the
+    server closes the connection.
+    """
+    family, target = parse_address(address)
+    if family == "unix":
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        reader, writer = await asyncio.open_connection(*target)
+    try:
+        while True:
+            try:
+                yield await read_message(reader)
+            except asyncio.IncompleteReadError:
+                return
+    finally:
+        writer.close()
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+
+class _Subscriber:
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+
+class EventServer:
+    """
+    Publishes landmarks and gesture events to the clients connected to a local socket.
+
+    :param address: `unix:PATH`, `HOST:PORT` or `PORT`, see `parse_address()`. Port 0 picks a free port,
+    available as `port` once started.
+    :param queue_size: Number of messages queued for every subscriber before the oldest ones are dropped
+    :param landmarks: Also publish the landmark array of every frame, not only the gesture events
+    """
+
+    def __init__(self, address, queue_size=64, landmarks=True):
+        self.family, self.target = parse_address(address)
+        self.queue_size = queue_size
+        self.landmarks = landmarks
+        self.port = None
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+        self._subscribers = set()
+        self._seq = 0
+
+        # `published` counts the messages published, `sent` and `dropped` the messages written to or
+        # dropped for the subscribers, which have come and gone as counted by `connections`.
+        self.counters = Counter()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    # Publishing, called from the vision loop
+
+    def publish_landmarks(self, hands_array, timestamp):
+        # Nothing is encoded while nobody listens.
+        if self.landmarks and self._subscribers:
+            self._publish(encode_landmarks(hands_array, timestamp))
+
+    def publish_event(self, name, hand, edge, timestamp):
+        if self._subscribers:
+            self._publish(encode_event(name, hand, edge, timestamp))
+
+    def gesture_listener(self, profile_name, hand, rule, edge, timestamp):
+        """
+        Listener for `GestureEngine.listeners` that publishes every gesture event.
+        """
+        self.publish_event(profile_name + "." + rule, hand, edge, timestamp)
+
+    def _publish(self, message):
+        self._loop.call_soon_threadsafe(self._broadcast, message)
+
+    # asyncio side
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._listen())
+        except Exception as error:
+            self._error = error
+            self._started.set()
+            return
+        self._started.set()
+        self._loop.run_forever()
+
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    async def _listen(self):
+        if self.family == "unix":
+            # A socket left behind by a previous run is replaced, but nothing else is ever deleted.
+            if os.path.lexists(self.target):
+                if not _is_socket(self.target):
+                    raise FileExistsError("{} exists and is not a socket".format(self.target))
+                os.unlink(self.target)
+            self._server = await asyncio.start_unix_server(self._serve, self.target)
+        else:
+            self._server = await asyncio.start_server(self._serve, *self.target)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    def _broadcast(self, message):
+        # The sequence number is only assigned here, on the loop thread, so it follows the order the
+        # messages are queued in.
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        message = message[:4] + self._seq.to_bytes(4, "little") + message[8:]
+        self.counters["published"] += 1
+        for subscriber in self._subscribers:
+            if len(subscriber.queue) == self.queue_size:
+                subscriber.dropped += 1
+                self.counters["dropped"] += 1
+                if not self._make_room(subscriber.queue, message):
+                    continue
+            subscriber.queue.append(message)
+            subscriber.ready.set()
+
+    @staticmethod
+    def _make_room(queue, message):
+        # Drops one message from a full queue to make room for `message`, and returns whether `message`
+        # is still to be queued: the oldest landmark frame goes first, then `message` itself when it is
+        # a landmark frame too, and only then the oldest event.
+        for index, queued in enumerate(queue):
+            if queued[0] == KIND_LANDMARKS:
+                del queue[index]
+                return True
+        if message[0] == KIND_LANDMARKS:
+            return False
+        queue.popleft()
+        return True
+
+    async def _serve(self, reader, writer):
+        subscriber = _Subscriber(writer, self.queue_size)
+        self._subscribers.add(subscriber)
+        self.counters["connections"] += 1
+        try:
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                # Everything queued so far is written at once, with a single drain.
+                messages = list(subscriber.queue)
+                subscriber.queue.clear()
+                writer.writelines(messages)
+                await writer.drain()
+                subscriber.sent += len(messages)
+                self.counters["sent"] += len(messages)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            writer.close()
+
+    def stop(self):
+        if self._loop is None or self._thread is None:
+            return
+
+        def shutdown():
+            self._server.close()
+            for subscriber in self._subscribers:
+                subscriber.writer.close()
+            self._loop.stop()
+
+        self._loop.call_soon_threadsafe(shutdown)
+        self._thread.join(timeout=2.0)
+        if self.family == "unix" and _is_socket(self.target):
+            os.unlink(self.target)
+
+    def stats(self):
+        return {
+            "subscribers": self.subscribers,
+            "connections": self.counters["connections"],
+            "published": self.counters["published"],
+            "sent": self.counters["sent"],
+            "dropped": self.counters["dropped"],
+        }
+
+
+def main(argv=None, prog=None):
+    """
+    Subscribes to an `EventServer` and prints the gesture events, and the landmarks with `--landmarks`.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="Print the messages published by an --events server.")
+    parser.add_argument("address", help="unix:PATH, HOST:PORT or PORT of the server")
+    parser.add_argument("--landmarks", action="store_true", help="also print a line for every landmark array")
+    args = parser.parse_args(argv)
+
+    received = Counter()
+
+    async def run():
+        last_seq = None
+        async for kind, arg, seq, timestamp, payload in subscribe(args.address):
+            received[kind] += 1
+            if last_seq is not None and seq != (last_seq + 1) & 0xFFFFFFFF:
+                received["dropped"] += (seq - last_seq - 1) & 0xFFFFFFFF
+            last_seq = seq
+            if kind == KIND_EVENT:
+                name, edge = payload
+                print("{:.3f} hand {} {} {}".format(timestamp, arg, name, edge))
+            elif args.landmarks:
+                print("{:.3f} landmarks of {} hand(s)".format(timestamp, arg))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    print("Received: ", {"landmarks": received[KIND_LANDMARKS], "events": received[KIND_EVENT], "dropped": received["dropped"]})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Smoothing and prediction filters for the cursor position in `virtual_mouse.py`.
+#
+# The pinch centre measured on every frame jitters by a few pixels, and by the time the cursor is moved
+# it already describes where the hand was when the frame was captured. The filters below smooth the
+# measured position and extrapolate it to the time the cursor is actually moved, which hides part of
+# the capture and inference latency. `CursorUpdater` can also keep moving the cursor along the
+# prediction at display rate between two inference frames.
+#
+# All filters share the same interface:
+#
+#     filter.update(point, timestamp)   # feed a measurement, returns the smoothed position
+#     filter.predict(timestamp)         # position extrapolated to `timestamp`, or None
+#     filter.reset()                    # forget the track, e.g. when the hand is lost
+
+import math
+import threading
+import time
+
+import numpy as np
+
+
+class CursorFilter:
+    """
+    Base class of the cursor filters. It stores the last estimate and its velocity, and extrapolates
+    them linearly in `predict()`.
+
+    :param max_prediction: Longest time, in seconds, the position is extrapolated ahead of the last
+    measurement. Beyond it the cursor would overshoot when the hand stops.
+    """
+
+    def __init__(self, max_prediction=0.1):
+        self.max_prediction = max_prediction
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.position = None
+        self.velocity = np.zeros(2)
+        self.timestamp = None
+
+    def update(self, point, timestamp):
+        """
+        Feeds a measured position taken at `timestamp` (seconds, `time.perf_counter()` clock) and returns
+        the smoothed position as an `(x, y)` tuple.
+        """
+        with self._lock:
+            point = np.asarray(point, dtype=np.float64)
+            if self.position is None or timestamp <= self.timestamp:
+                self.position = point
+                self.velocity = np.zeros(2)
+            else:
+                self._update(point, timestamp - self.timestamp)
+            self.timestamp = timestamp
+            return tuple(self.position)
+
+    def _update(self, point, dt):
+        raise NotImplementedError
+
+    def predict(self, timestamp):
+        """
+        Returns the position extrapolated to `timestamp`, or `None` when no measurement was fed since
+        the last reset.
+        """
+        with self._lock:
+            if self.position is None:
+                return None
+            ahead = min(max(timestamp - self.timestamp, 0.0), self.max_prediction)
+            return tuple(self.position + self.velocity * ahead)
+
+
+class PassThroughFilter(CursorFilter):
+    """
+    Uses the measured position as is. `predict()` still extrapolates with the velocity between the last
+    two measurements.
+    """
+
+    def _update(self, point, dt):
+        self.velocity = (point - self.position) / dt
+        self.position = point
+
+
+class OneEuroFilter(CursorFilter):
+    """
+    The One Euro filter (Casiez et al., CHI 2012): a low-pass filter whose cutoff frequency rises with
+    the speed of the movement, so slow movements are smoothed heavily and fast movements keep a low
+    lag.
+
+    :param min_cutoff: Cutoff frequency in Hz used when the hand is still. Lower values remove more
+    jitter.
+    :param beta: How fast the cutoff rises with the speed. Higher values reduce the lag of fast
+    movements.
+    :param d_cutoff: Cutoff frequency in Hz of the filter applied to the velocity
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.007, d_cutoff=1.0, max_prediction=0.1):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        super().__init__(max_prediction)
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def _update(self, point, dt):
+        raw_velocity = (point - self.position) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.velocity = a_d * raw_velocity + (1 - a_d) * self.velocity
+
+        cutoff = self.min_cutoff + self.beta * np.linalg.norm(self.velocity)
+        a = self._alpha(cutoff, dt)
+        self.position = a * point + (1 - a) * self.position
+
+
+class KalmanFilter(CursorFilter):
+    """
+    A constant-velocity Kalman filter tracking the position and velocity of the cursor in both axes.
+
+    :param process_noise: Spectral density of the random acceleration, in pixels²/s³. Higher values
+    follow changes of direction faster.
+    :param measurement_noise: Variance of the measured position, in pixels²
+    """
+
+    def __init__(self, process_noise=5e4, measurement_noise=25.0, max_prediction=0.1):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        super().__init__(max_prediction)
+
+    def _reset(self):
+        super()._reset()
+        # Covariance of the [x, y, vx, vy] state. The velocity starts out unknown.
+        self.covariance = np.diag([self.measurement_noise] * 2 + [1e6] * 2)
+
+    def _update(self, point, dt):
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+
+        # Discretized white-noise acceleration model.
+        q = self.process_noise
+        block = np.array([[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]]) * q
+        noise = np.zeros((4, 4))
+        noise[np.ix_([0, 2], [0, 2])] = block
+        noise[np.ix_([1, 3], [1, 3])] = block
+
+        # Predict
+        state = transition @ np.concatenate([self.position, self.velocity])
+        covariance = transition @ self.covariance @ transition.T + noise
+
+        # Correct with the measured position.
+        innovation = point - state[:2]
+        innovation_covariance = covariance[:2, :2] + np.eye(2) * self.measurement_noise
+        gain = covariance[:, :2] @ np.linalg.inv(innovation_covariance)
+        state = state + gain @ innovation
+        self.covariance = (np.eye(4) - gain @ np.eye(2, 4)) @ covariance
+
+        self.position, self.velocity = state[:2], state[2:]
+
+
+FILTERS = {
+    "none": PassThroughFilter,
+    "one-euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+
+def make_filter(name, **kwargs):
+    """
+    Creates a cursor filter by name: `"none"`, `"one-euro"` or `"kalman"`.
+    """
+    try:
+        return FILTERS[name](**kwargs)
+    except KeyError:
+        raise ValueError("Unknown cursor filter {!r}, expected one of {}".format(name, ", ".join(FILTERS)))
+
+
+class CursorUpdater:
+    """
+    Moves the cursor along the prediction of a filter at display rate, between and independently of the
+    inference frames.
+
+    :param cursor_filter: The filter fed by the inference loop
+    :param move: Function called with the predicted `(x, y)` position, in the same units the filter is
+    fed with. It is responsible for mapping the position to the screen and moving the cursor.
+    :param rate: Number of updates per second, usually the refresh rate of the display
+    """
+
+    def __init__(self, cursor_filter, move, rate=60.0):
+        self.cursor_filter = cursor_filter
+        self.move = move
+        self.interval = 1.0 / rate
+        self.updates = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cursor-updater", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last = None
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            position = self.cursor_filter.predict(time.perf_counter())
+            if position is not None and position != last:
+                self.move(position)
+                self.updates += 1
+                last = position
+
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_time = time.perf_counter()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,74 @@
+# Frame preparation for `hands.process()` without per-frame copies.
+#
+# The loops used to mirror every frame with `cv2.flip(image, 1)`, a full-frame allocation and copy,
+# and then passed the BGR array from OpenCV to MediaPipe, which expects RGB. `FramePreparer` converts
+# the camera frame from BGR to RGB into a buffer allocated once and reused for every frame, and hands
+# it out as a read-only view, which lets MediaPipe use the pixels by reference. The image is no longer
+# mirrored: the model runs on the camera image as is and `mirror_landmarks()` mirrors the resulting
+# coordinates instead, which costs 21 subtractions per hand rather than a pass over every pixel. Only
+# the preview, when it is shown, is still flipped (see `PreviewWindow.mirror()`).
+#
+# `FrameScaler` downscales frames into a reused buffer the same way, for the stages that run on a
+# smaller image: the crop of `RoiHands`, the input of `GovernedHands` and the preview.
+
+import cv2
+import numpy as np
+
+
+class FramePreparer:
+    """
+    Converts BGR camera frames into the read-only RGB images passed to `hands.process()`, reusing the
+    same buffer for every frame. The returned image is only valid until the next call to `prepare()`.
+    """
+
+    def __init__(self):
+        self._buffer = None
+        self._view = None
+        self.frames = 0
+        self.reallocations = 0
+
+    def prepare(self, frame):
+        if self._buffer is None or self._buffer.shape != frame.shape:
+            self._buffer = np.empty(frame.shape, dtype=np.uint8)
+            self._view = self._buffer.view()
+            self._view.flags.writeable = False
+            self.reallocations += 1
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffer)
+        self.frames += 1
+        return self._view
+
+    def stats(self):
+        return {"frames": self.frames, "reallocations": self.reallocations}
+
+
+class FrameScaler:
+    """
+    Downscales images into a buffer that is reused as long as the scaled size stays the same. The
+    returned image is only valid until the next call to `scale()`.
+
+    :param interpolation: OpenCV interpolation flag, `cv2.INTER_AREA` by default
+    """
+
+    def __init__(self, interpolation=cv2.INTER_AREA):
+        self.interpolation = interpolation
+        self._buffer = None
+
+    def scale(self, image, scale, copy=False):
+        """
+        Returns `image` scaled by `scale`. At a scale of 1.0 or more the image is returned as is, or
+        copied into the buffer when `copy` is set.
+        """
+        height, width = image.shape[:2]
+        if scale < 1.0:
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+        elif not copy:
+            return image
+        shape = (height, width) + image.shape[2:]
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=image.dtype)
+
+        if scale < 1.0:
+            return cv2.resize(image, (width, height), dst=self._buffer, interpolation=self.interpolation)
+        np.copyto(self._buffer, image)
+        return self._buffer
@@ -0,0 +1,384 @@
+# Declarative gesture engine shared by `virtual_mouse.py` and `virtual_keyboard.py`.
+#
+# A gesture is declared as a `Rule`: a list of `Condition`s on the features of a hand (number of open
+# fingers, pinch distance, position of the index finger tip, ...) and the actions to run when the rule
+# becomes active, while it stays active and when it stops being active. The rules of a program form a
+# `Profile`, bound to the controller the actions are sent to and to the hands it follows.
+#
+# `GestureEngine` compiles the conditions of all its profiles into arrays once, and evaluates them on
+# every frame for every hand with a handful of NumPy operations over a precomputed feature vector.
+# Every condition has hysteresis: it becomes true at its `threshold` but only turns false again past
+# its `release` value, so a value hovering around a threshold does not make the gesture flicker. On
+# top of the rules, every profile has a small state machine: a rule can move the profile to another
+# state (`goto`) and only become active in some states (`states`), e.g. pausing only while playing.
+#
+# Since one engine can hold several profiles, one inference pass can drive both the mouse and the
+# media keys, each on its own hand or both on the same one.
+#
+# The order MediaPipe reports the hands in changes from frame to frame, so the engine does not follow
+# the index of a hand in the landmark array but a slot: a hand keeps its slot as long as it is seen
+# with the same handedness, and a new hand takes the first free slot. Profiles follow a slot, e.g. 0
+# for the first hand seen, or directly the `"left"` or `"right"` hand. When the hand of a slot is lost,
+# the rules active on it stop, with their exit actions, so e.g. a button held by a pinch is released.
+#
+#     engine = GestureEngine([mouse_profile, keyboard_profile], (width, height))
+#     engine.update(hands_array, timestamp)
+
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from .landmarks import INDEX_TIP, LEFT, RIGHT, count_fingers, palm_size, pinch, tip_positions
+
+# Features computed once per frame for every hand, in the order of the columns of the feature array
+# passed to the actions. Positions and distances are in pixels of the video frame, except for the last
+# two, which hold at any resolution: `pinch_ratio` is the pinch distance in palm sizes (see
+# `palm_size()`), and `index_from_right_frac` the distance of the index finger tip to the right edge
+# as a fraction of the frame width. The rules use those two, so the capture resolution can change
+# without retuning them.
+FEATURES = (
+    "fingers", "pinch_distance", "pinch_x", "pinch_y", "index_x", "index_y", "index_from_right",
+    "palm_size", "pinch_ratio", "index_from_right_frac",
+)
+(
+    FINGERS, PINCH_DISTANCE, PINCH_X, PINCH_Y, INDEX_X, INDEX_Y, INDEX_FROM_RIGHT,
+    PALM_SIZE, PINCH_RATIO, INDEX_FROM_RIGHT_FRAC,
+) = range(len(FEATURES))
+
+OPS = ("<", "<=", ">", ">=", "==")
+
+# Largest number of hands an engine follows by default, and the names of the hands profiles can follow
+# by handedness instead of by slot.
+MAX_HANDS = 2
+HANDEDNESS = {"left": LEFT, "right": RIGHT}
+
+
+def parse_hand(value):
+    """
+    Parses the hand a profile follows, given on the command line: a slot below `MAX_HANDS`, or `left`
+    or `right`. Raises `argparse.ArgumentTypeError` otherwise, so it can be used as an argument type.
+    """
+    value = value.strip().lower()
+    if value in HANDEDNESS:
+        return value
+    if value.isdigit() and int(value) < MAX_HANDS:
+        return int(value)
+    raise argparse.ArgumentTypeError(
+        "invalid hand {!r}, expected left, right or a number below {}".format(value, MAX_HANDS)
+    )
+
+
+def compute_features(hands_array, width, height):
+    """
+    Computes the feature vector of every hand.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    :param width: Width of the video frame in pixels
+    :param height: Height of the video frame in pixels
+    :return: A float32 array of shape `(hands, len(FEATURES))`
+    """
+    features = np.empty((len(hands_array), len(FEATURES)), dtype=np.float32)
+    centers, distances = pinch(hands_array, width, height)
+    index = tip_positions(hands_array, width, height, ids=(INDEX_TIP,))[:, 0]
+
+    features[:, FINGERS] = count_fingers(hands_array)
+    features[:, PINCH_DISTANCE] = distances
+    features[:, PINCH_X:PINCH_Y + 1] = centers
+    features[:, INDEX_X:INDEX_Y + 1] = index
+    features[:, INDEX_FROM_RIGHT] = width - index[:, 0]
+    features[:, PALM_SIZE] = palm_size(hands_array, width, height)
+    # A palm size of zero only comes from degenerate landmarks, where the ratio is meaningless anyway.
+    np.divide(distances, np.maximum(features[:, PALM_SIZE], 1e-6), out=features[:, PINCH_RATIO])
+    features[:, INDEX_FROM_RIGHT_FRAC] = features[:, INDEX_FROM_RIGHT] / width
+    return features
+
+
+class Condition:
+    """
+    A comparison of one feature of a hand with a threshold, e.g. `Condition("pinch_ratio", "<=", 0.45)`.
+
+    :param feature: Name of the feature, one of `FEATURES`
+    :param op: One of `"<"`, `"<="`, `">"`, `">="` and `"=="`
+    :param threshold: Value the feature is compared with for the condition to become true
+    :param release: Value the feature is compared with, once the condition is true, for it to stay
+    true. It should lie past `threshold` in the direction the comparison allows, e.g. 0.55 for `<= 0.45`.
+    Defaults to `threshold`, without hysteresis.
+    """
+
+    def __init__(self, feature, op, threshold, release=None):
+        if feature not in FEATURES:
+            raise ValueError("Unknown feature {!r}, expected one of {}".format(feature, ", ".join(FEATURES)))
+        if op not in OPS:
+            raise ValueError("Unknown operator {!r}, expected one of {}".format(op, ", ".join(OPS)))
+        self.feature = feature
+        self.op = op
+        self.threshold = threshold
+        self.release = threshold if release is None else release
+
+    def __repr__(self):
+        return "Condition({!r}, {!r}, {!r}, release={!r})".format(self.feature, self.op, self.threshold, self.release)
+
+
+class Rule:
+    """
+    A gesture: it is active while all its conditions are true.
+
+    Actions are either a `(method, *args)` tuple called on the controller of the profile, e.g.
+    `("tap", Key.space)`, or a function called with the feature vector of the hand and the timestamp
+    of the frame.
+
+    :param name: Name of the gesture, reported to the listeners of the engine
+    :param conditions: List of `Condition`s. A rule without any is active whenever the hand is visible.
+    :param on_enter: Action run when the rule becomes active
+    :param on_exit: Action run when the rule stops being active
+    :param each_frame: Action run on every frame the rule is active, including the first one
+    :param states: States of the profile the rule can become active in, or `None` for any state
+    :param goto: State the profile moves to when the rule becomes active
+    """
+
+    def __init__(self, name, conditions, on_enter=None, on_exit=None, each_frame=None, states=None, goto=None):
+        self.name = name
+        self.conditions = list(conditions)
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.each_frame = each_frame
+        self.states = None if states is None else tuple(states)
+        self.goto = goto
+
+    def __repr__(self):
+        return "Rule({!r}, {!r})".format(self.name, self.conditions)
+
+
+class Profile:
+    """
+    The rules of one program, bound to the controller their actions are sent to.
+
+    :param name: Name of the profile, e.g. `"mouse"`
+    :param rules: List of `Rule`s, evaluated in order on every frame
+    :param controller: Object the `(method, *args)` actions are called on, e.g. an `InputDispatcher`
+    :param hands: Hands the profile follows: slots of the engine (0 for the first hand seen, 1 for the
+    second one) or `"left"` and `"right"`
+    :param initial: State the profile starts in
+    :param on_lost: Function called with the slot when a followed hand disappears
+    """
+
+    def __init__(self, name, rules, controller=None, hands=(0,), initial=None, on_lost=None):
+        self.name = name
+        self.rules = list(rules)
+        self.controller = controller
+        self.hands = tuple(hands)
+        self.initial = initial
+        self.on_lost = on_lost
+
+
+class GestureEngine:
+    """
+    Evaluates the rules of several profiles on the hands of every frame.
+
+    :param profiles: List of `Profile`s
+    :param frame_size: The `(width, height)` of the video frames in pixels
+    :param max_hands: Largest number of hands followed, hands beyond it are ignored
+    """
+
+    def __init__(self, profiles, frame_size, max_hands=MAX_HANDS):
+        self.profiles = list(profiles)
+        self.width, self.height = frame_size
+        self.max_hands = max_hands
+        for profile in self.profiles:
+            for hand in profile.hands:
+                if hand not in HANDEDNESS and not 0 <= hand < max_hands:
+                    raise ValueError("profile {!r} follows hand {!r}, the engine only follows {} hands".format(
+                        profile.name, hand, max_hands
+                    ))
+
+        # Functions called with `(profile, hand, rule, edge, timestamp)` whenever a rule becomes active
+        # (`edge` is `"enter"`) or stops being active (`"exit"`).
+        self.listeners = []
+        self.counters = Counter()
+
+        # Flatten the rules of all profiles and their conditions into arrays, so every frame only runs a
+        # few vectorized comparisons regardless of the number of rules.
+        self._rules = [(profile, rule) for profile in self.profiles for rule in profile.rules]
+        conditions = [condition for _, rule in self._rules for condition in rule.conditions]
+        self._columns = np.array([FEATURES.index(c.feature) for c in conditions], dtype=np.intp)
+        ops = np.array([OPS.index(c.op) for c in conditions], dtype=np.intp)
+        self._ops = [ops == i for i in range(len(OPS))]
+        self._thresholds = np.array([c.threshold for c in conditions], dtype=np.float32)
+        self._releases = np.array([c.release for c in conditions], dtype=np.float32)
+
+        # `_members[r, c]` is 1 when condition `c` belongs to rule `r`.
+        self._members = np.zeros((len(self._rules), len(conditions)), dtype=np.int32)
+        start = 0
+        for r, (_, rule) in enumerate(self._rules):
+            self._members[r, start : start + len(rule.conditions)] = 1
+            start += len(rule.conditions)
+
+        # Every row is the slot of a hand. `_labels` holds the handedness of the hand in every slot, -1
+        # when unknown, and `_features` its features on the last frame it was seen. `_slots` is the slot
+        # of every hand of the last frame, in the order of its `hands_array`.
+        self._condition_active = np.zeros((max_hands, len(conditions)), dtype=bool)
+        self._rule_active = np.zeros((max_hands, len(self._rules)), dtype=bool)
+        self._present = np.zeros(max_hands, dtype=bool)
+        self._labels = np.full(max_hands, -1, dtype=np.int8)
+        self._features = np.zeros((max_hands, len(FEATURES)), dtype=np.float32)
+        self._slots = np.zeros(0, dtype=np.intp)
+        self.states = {profile.name: [profile.initial] * max_hands for profile in self.profiles}
+
+    def update(self, hands_array, timestamp=None, handedness=None):
+        """
+        Evaluates the rules on the hands of a frame and runs their actions.
+
+        :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+        :param timestamp: Time the frame was captured, passed on to the actions and listeners
+        :param handedness: The handedness of every hand returned by `handedness_labels()`. Without it,
+        the index of a hand in the array is its slot.
+        :return: The feature array of the frame, in the order of `hands_array`
+        """
+        hands_array = hands_array[: self.max_hands]
+        count = len(hands_array)
+        features = compute_features(hands_array, self.width, self.height)
+        slots, labels = self._assign(count, None if handedness is None else handedness[:count])
+
+        # The hands that disappeared, or whose slot went to another hand, are lost before the rules of
+        # the new hands run.
+        present = np.zeros(self.max_hands, dtype=bool)
+        present[slots] = True
+        for slot in np.flatnonzero(self._present & (~present | (labels != self._labels))):
+            self._lose(int(slot), timestamp)
+        self._present = present
+        self._labels = labels
+        self._slots = slots
+        self._features[slots] = features
+
+        # Conditions, with the release value as threshold for the ones that are currently true. The rows
+        # of the slots without a hand are never true.
+        values = self._features[:, self._columns]
+        thresholds = np.where(self._condition_active, self._releases, self._thresholds)
+        lt, le, gt, ge, eq = self._ops
+        met = (
+            (lt & (values < thresholds))
+            | (le & (values <= thresholds))
+            | (gt & (values > thresholds))
+            | (ge & (values >= thresholds))
+            | (eq & (values == thresholds))
+        ) & present[:, None]
+        self._condition_active = met
+
+        # A rule is true when none of its conditions failed.
+        rules_true = ((~met).astype(np.int32) @ self._members.T) == 0
+
+        for r, (profile, rule) in enumerate(self._rules):
+            for hand in profile.hands:
+                slot = self._slot(hand)
+                if slot is not None:
+                    self._step(r, profile, rule, slot, bool(rules_true[slot, r]), self._features[slot], timestamp)
+
+        self.counters["frames"] += 1
+        return features
+
+    def _assign(self, count, handedness):
+        # Returns the slot of every hand and the handedness of every slot. A hand keeps the slot of the
+        # hand with the same handedness on the previous frame, and the other hands take the free slots,
+        # the ones that had no hand on the previous frame first.
+        labels = np.full(self.max_hands, -1, dtype=np.int8)
+        if handedness is None or (handedness < 0).any():
+            return np.arange(count), labels
+
+        slots = np.full(count, -1, dtype=np.intp)
+        taken = np.zeros(self.max_hands, dtype=bool)
+        for index in range(count):
+            same = np.flatnonzero(self._present & (self._labels == handedness[index]) & ~taken)
+            if len(same):
+                slots[index] = same[0]
+                taken[same[0]] = True
+        for index in np.flatnonzero(slots < 0):
+            free = np.flatnonzero(~taken)
+            unused = free[~self._present[free]]
+            slots[index] = unused[0] if len(unused) else free[0]
+            taken[slots[index]] = True
+        labels[slots] = handedness
+        return slots, labels
+
+    def _slot(self, hand):
+        # Returns the slot of a hand followed by a profile, or `None` when that hand is not visible.
+        if hand in HANDEDNESS:
+            slots = np.flatnonzero(self._present & (self._labels == HANDEDNESS[hand]))
+            return int(slots[0]) if len(slots) else None
+        return hand if self._present[hand] else None
+
+    def index(self, hand):
+        """
+        Returns the index in the `hands_array` of the last frame of a hand followed by a profile (a slot
+        or `"left"` or `"right"`), or `None` when that hand is not visible.
+        """
+        slot = self._slot(hand)
+        if slot is None:
+            return None
+        return int(np.flatnonzero(self._slots == slot)[0])
+
+    def _lose(self, slot, timestamp):
+        # The rules active on the lost hand stop as if their conditions turned false, so their exit
+        # actions run, and the hand after it in the slot starts without hysteresis, in the initial
+        # state of every profile.
+        self.counters["lost"] += 1
+        for r, (profile, rule) in enumerate(self._rules):
+            if self._rule_active[slot, r]:
+                self._rule_active[slot, r] = False
+                self._emit(profile, slot, rule, "exit", timestamp)
+                self._run(profile, rule.on_exit, self._features[slot], timestamp)
+        self._condition_active[slot] = False
+
+        label = self._labels[slot]
+        for profile in self.profiles:
+            self.states[profile.name][slot] = profile.initial
+            followed = any(hand == slot if hand not in HANDEDNESS else HANDEDNESS[hand] == label for hand in profile.hands)
+            if followed and profile.on_lost is not None:
+                profile.on_lost(slot)
+
+    def _step(self, r, profile, rule, hand, true, features, timestamp):
+        active = self._rule_active[hand, r]
+        states = self.states[profile.name]
+
+        if true and not active:
+            if rule.states is not None and states[hand] not in rule.states:
+                return
+            self._rule_active[hand, r] = active = True
+            if rule.goto is not None:
+                states[hand] = rule.goto
+            self._emit(profile, hand, rule, "enter", timestamp)
+            self._run(profile, rule.on_enter, features, timestamp)
+        elif active and not true:
+            self._rule_active[hand, r] = active = False
+            self._emit(profile, hand, rule, "exit", timestamp)
+            self._run(profile, rule.on_exit, features, timestamp)
+
+        if active and rule.each_frame is not None:
+            self._run(profile, rule.each_frame, features, timestamp)
+
+    def _run(self, profile, action, features, timestamp):
+        if action is None:
+            return
+        if callable(action):
+            action(features, timestamp)
+        else:
+            method, *args = action
+            getattr(profile.controller, method)(*args)
+
+    def _emit(self, profile, hand, rule, edge, timestamp):
+        self.counters[rule.name + "." + edge] += 1
+        for listener in self.listeners:
+            listener(profile.name, hand, rule.name, edge, timestamp)
+
+    def state(self, profile, hand=0):
+        """
+        Returns the current state of a profile for a hand, a slot or `"left"` or `"right"`.
+        """
+        if hand in HANDEDNESS:
+            hand = self._slot(hand)
+            if hand is None:
+                return None
+        return self.states[profile][hand]
+
+    def stats(self):
+        return dict(self.counters)
@@ -0,0 +1,254 @@
+# Adaptive quality governor for the MediaPipe Hands model.
+#
+# `mp_hands.Hands()` is created once with fixed settings, so on a busy machine every frame takes longer
+# than the camera interval and the cursor lags further and further behind the hand. `QualityGovernor`
+# watches how long the loop spends on every frame against a budget (the camera frame interval by
+# default) and walks a ladder of quality levels: it steps down (a lighter model, fewer hands, a
+# downscaled input, then running inference on every second or third frame only) when the recent frame
+# times exceed the budget, and back up when they leave enough headroom for a while. A level running
+# inference on one frame out of `every` has `every` frame intervals for it, so its budget is that many
+# times larger, and stepping up to a level needs headroom within the budget of that level. Stepping
+# up needs several calm windows in a row, and that number doubles whenever a step up has to be undone
+# right away, so the quality does not oscillate. Every change is logged.
+#
+# `GovernedHands` applies the current level: it recreates the model when its complexity or number of
+# hands changes and downscales the input image. With a `RoiHands`, only the model inside it is
+# replaced, so the crop it tracks and its counters survive the change.
+
+import time
+
+import numpy as np
+
+from .frames import FrameScaler
+
+
+class QualityLevel:
+    """
+    One step of the quality ladder.
+
+    :param model_complexity: `model_complexity` of `mp_hands.Hands`, 1 (full) or 0 (lite)
+    :param max_num_hands: `max_num_hands` of `mp_hands.Hands`
+    :param scale: Scale applied to the image before inference
+    :param every: Run inference on one frame out of this many
+    """
+
+    def __init__(self, model_complexity=1, max_num_hands=2, scale=1.0, every=1):
+        self.model_complexity = model_complexity
+        self.max_num_hands = max_num_hands
+        self.scale = scale
+        self.every = every
+
+    def __str__(self):
+        return "model_complexity={} max_num_hands={} scale={:g} every={}".format(
+            self.model_complexity, self.max_num_hands, self.scale, self.every
+        )
+
+
+# From the highest quality (the defaults of `mp_hands.Hands`) to the lightest.
+LEVELS = [
+    QualityLevel(1, 2, 1.0, 1),
+    QualityLevel(1, 1, 1.0, 1),
+    QualityLevel(0, 1, 1.0, 1),
+    QualityLevel(0, 1, 0.75, 1),
+    QualityLevel(0, 1, 0.5, 1),
+    QualityLevel(0, 1, 0.5, 2),
+    QualityLevel(0, 1, 0.5, 3),
+]
+
+
+class QualityGovernor:
+    """
+    Chooses the quality level from the time spent on the recent frames.
+
+    :param budget: Time available for every frame, in seconds, usually `1 / fps` of the camera, and
+    `every` times that at the levels running inference on one frame out of `every`. It may be `None`
+    until the camera is open, but must be set before the first call to `record()`.
+    :param enabled: When `False` the governor stays at the first level and never changes it
+    :param levels: The quality ladder, from the highest quality to the lightest
+    :param min_hands: Levels following fewer hands than this follow this many instead, e.g. 2 when a
+    profile follows the second hand, and keep their other steps
+    :param window: Number of processed frames the decisions are made on
+    :param percentile: Percentile of the frame times in a window compared with the budget
+    :param headroom: Fraction of the budget the frame times must stay under to step back up
+    :param patience: Number of windows in a row with headroom needed before stepping up
+    :param log: Function called with a message for every change of level
+    """
+
+    def __init__(self, budget=1 / 30, enabled=True, levels=LEVELS, min_hands=1, window=30, percentile=90,
+                 headroom=0.6, patience=3, log=print):
+        self.budget = budget
+        self.enabled = enabled
+        self.levels = []
+        for level in levels:
+            level = QualityLevel(level.model_complexity, max(level.max_num_hands, min_hands), level.scale, level.every)
+            # Raising the number of hands can make a level identical to the one above it, which would
+            # only be a wasted step.
+            if not self.levels or str(level) != str(self.levels[-1]):
+                self.levels.append(level)
+        self.window = window
+        self.percentile = percentile
+        self.headroom = headroom
+        self.patience = patience
+        self.log = log
+
+        self.index = 0
+        self._samples = np.zeros(window, dtype=np.float64)
+        self._count = 0
+        self._calm = 0
+        self._cooldown = False
+        self._stepped_up = False
+        self._frame = 0
+
+        self.steps_down = 0
+        self.steps_up = 0
+        self.frames_skipped = 0
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def due(self):
+        """
+        Returns whether inference should run on the current frame, given the `every` of the current
+        level. Must be called once per captured frame.
+        """
+        self._frame += 1
+        if (self._frame - 1) % self.level.every:
+            self.frames_skipped += 1
+            return False
+        return True
+
+    def record(self, seconds):
+        """
+        Adds the time spent on a processed frame and changes the level at the end of every window when
+        needed. Returns whether the level changed.
+        """
+        if not self.enabled:
+            return False
+
+        self._samples[self._count] = seconds
+        self._count += 1
+        if self._count < self.window:
+            return False
+        self._count = 0
+
+        # The first window after a change includes the start-up of the new model, so it is left out.
+        if self._cooldown:
+            self._cooldown = False
+            return False
+
+        load = np.percentile(self._samples, self.percentile)
+        if load > self.budget * self.level.every and self.index < len(self.levels) - 1:
+            # A step up that has to be undone immediately means the headroom was misleading, so the
+            # next step up waits twice as long.
+            if self._stepped_up:
+                self.patience *= 2
+            self._change(self.index + 1, load)
+            self.steps_down += 1
+            return True
+
+        self._stepped_up = False
+        if self.index > 0 and load < self.budget * self.levels[self.index - 1].every * self.headroom:
+            self._calm += 1
+            if self._calm >= self.patience:
+                self._change(self.index - 1, load)
+                self._stepped_up = True
+                self.steps_up += 1
+                return True
+        else:
+            self._calm = 0
+        return False
+
+    def _change(self, index, load):
+        previous, self.index = self.index, index
+        self._calm = 0
+        self._cooldown = True
+        self.log("Quality {} to level {}: {} (was {}, p{} frame time {:.1f} ms, budget {:.1f} ms)".format(
+            "down" if index > previous else "up", index, self.level, self.levels[previous],
+            self.percentile, load * 1000.0, self.budget * self.levels[min(index, previous)].every * 1000.0,
+        ))
+
+    def stats(self):
+        return {
+            "level": self.index,
+            "steps_down": self.steps_down,
+            "steps_up": self.steps_up,
+            "frames_skipped": self.frames_skipped,
+            "patience": self.patience,
+        }
+
+
+class GovernedHands:
+    """
+    Runs hand inference with the settings of the current level of a `QualityGovernor`.
+
+    :param governor: The `QualityGovernor` choosing the level
+    :param factory: Function called with `model_complexity` and `max_num_hands` that returns a new
+    `mp_hands.Hands`
+    :param roi: Optional `RoiHands` the models run in, see `roi.py`. It gets two models from `factory`,
+    one for the crops and one for the full frames.
+    """
+
+    def __init__(self, governor, factory, roi=None):
+        self.governor = governor
+        self.factory = factory
+        self.roi = roi
+        self.hands = None
+        self._settings = None
+        self._scaler = FrameScaler()
+        self.rebuilds = 0
+
+    def process(self, image):
+        level = self.governor.level
+        settings = (level.model_complexity, level.max_num_hands)
+        if settings != self._settings:
+            if self.hands is not None:
+                if self.roi is None:
+                    self.hands.close()
+                self.rebuilds += 1
+            start = time.perf_counter()
+            model = self.factory(model_complexity=level.model_complexity, max_num_hands=level.max_num_hands)
+            if self.roi is not None:
+                self.roi.replace(model, self.factory(model_complexity=level.model_complexity, max_num_hands=level.max_num_hands))
+                model = self.roi
+            self.hands = model
+            self._settings = settings
+            if self.rebuilds:
+                self.governor.log("Model rebuilt in {:.1f} ms".format((time.perf_counter() - start) * 1000.0))
+
+        # The landmarks are normalized, so inference on a downscaled image needs no mapping back.
+        return self.hands.process(self._scaler.scale(image, level.scale))
+
+    def close(self):
+        if self.hands is not None:
+            self.hands.close()
+
+
+def add_governor_arguments(parser):
+    """
+    Adds the `--adaptive` and `--frame-budget` options to an `argparse` parser.
+    """
+    parser.add_argument("--adaptive", action="store_true", help="lower the model quality, input size and inference rate under load, and raise them back when there is headroom")
+    parser.add_argument("--frame-budget", type=float, default=0, help="time available for every frame with --adaptive, in milliseconds (defaults to the camera frame interval)")
+
+
+def frame_interval(fps):
+    """
+    Returns the interval between two camera frames in seconds, the default budget of the governor.
+    """
+    return 1.0 / (fps if fps and fps > 0 else 30.0)
+
+
+def governor_from_args(args, fps=None, min_hands=1):
+    """
+    Returns the `QualityGovernor` selected by the options added by `add_governor_arguments()`.
+
+    :param fps: Frame rate applied by the camera, used for the default budget. When it is not known
+    yet the budget is left to `None`, to be set once the camera is open.
+    :param min_hands: Number of hands the gesture profiles need
+    """
+    if args.frame_budget > 0:
+        budget = args.frame_budget / 1000.0
+    else:
+        budget = frame_interval(fps) if fps is not None else None
+    return QualityGovernor(budget, enabled=args.adaptive, min_hands=min_hands)
@@ -0,0 +1,286 @@
+# Low-overhead instrumentation for the main loops.
+#
+# Instead of printing from the hot path on every frame, the loops time their stages into rolling
+# histograms and bump counters on a shared `Instrumentation` object. A `SnapshotExporter` thread
+# writes periodic JSON snapshots of it to a file, and `SampledLogger` keeps the verbose debug output
+# available while only printing one message out of every N. `AllocationMeter` measures how much memory
+# every frame allocates.
+#
+#     metrics = Instrumentation()
+#     with metrics.time("process"):
+#         results = hands.process(image)
+#     metrics.count("frames")
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def summarize(values):
+    """
+    Summarizes durations in seconds as milliseconds: count, mean, p50, p95, p99 and max.
+    """
+    values = np.asarray(values, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+class RollingHistogram:
+    """
+    Keeps the last `size` samples of a duration in a ring buffer, so percentiles describe the recent
+    behaviour of the loop and recording a sample never allocates.
+
+    :param size: Number of samples kept
+    """
+
+    def __init__(self, size=1024):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._next = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        with self._lock:
+            self._samples[self._next] = value
+            self._next = (self._next + 1) % len(self._samples)
+            self.total += 1
+
+    def summary(self):
+        with self._lock:
+            samples = self._samples[: min(self.total, len(self._samples))].copy()
+            total = self.total
+        summary = summarize(samples)
+        summary["total"] = total
+        return summary
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add(time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    """
+    Collection of named rolling histograms and counters shared by the stages of the pipeline.
+
+    :param size: Number of samples every histogram keeps
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.started = time.time()
+        self._histograms = {}
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, RollingHistogram(self.size))
+        return histogram
+
+    def time(self, name):
+        """
+        Returns a context manager recording the time spent in its block into the histogram `name`.
+        The timer is reused across calls, so it must not be nested with itself or shared between
+        threads.
+        """
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _Timer(self.histogram(name))
+        return timer
+
+    def record(self, name, seconds):
+        """
+        Adds a duration measured elsewhere, e.g. the age of a frame, to the histogram `name`.
+        """
+        self.histogram(name).add(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """
+        Sets a gauge, e.g. counters reported by another object such as the capture stage.
+        """
+        with self._lock:
+            self._counters[name] = value
+
+    def update(self, prefix, stats):
+        """
+        Sets a gauge for every numeric value of a `stats()` dictionary, named `prefix.key`.
+        """
+        with self._lock:
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    self._counters[prefix + "." + key] = value
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.started,
+            "stages": {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+            "counters": counters,
+        }
+
+
+class SnapshotExporter:
+    """
+    Writes a JSON snapshot of an `Instrumentation` object to a file at a fixed interval, from its own
+    thread. The file is replaced atomically so readers never see a partial snapshot.
+
+    :param metrics: The `Instrumentation` object to export
+    :param path: File the snapshots are written to
+    :param interval: Seconds between two snapshots
+    :param collect: Optional function called before every snapshot, e.g. to copy the counters of the
+    capture stage and the dispatcher into `metrics`
+    """
+
+    def __init__(self, metrics, path, interval=5.0, collect=None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.collect = collect
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self):
+        if self.collect is not None:
+            self.collect()
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(temporary, self.path)
+
+    def stop(self):
+        """
+        Stops the thread and writes a last snapshot.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.export()
+
+
+class SampledLogger:
+    """
+    Prints verbose debug messages, but only one out of every `every` calls for the same message key,
+    so debug output can stay on without printing from the hot path on every frame.
+
+    :param enabled: Whether anything is printed at all
+    :param every: Print one call out of this many for every key
+    """
+
+    def __init__(self, enabled=False, every=30):
+        self.enabled = enabled
+        self.every = max(1, every)
+        self._calls = {}
+
+    def __call__(self, key, *args):
+        if not self.enabled:
+            return
+        calls = self._calls.get(key, 0)
+        self._calls[key] = calls + 1
+        if calls % self.every == 0:
+            print(key, *args)
+
+
+class AllocationMeter:
+    """
+    Measures the memory allocated from one frame to the next with `tracemalloc`, which also traces the
+    buffers of NumPy arrays and so of the OpenCV images. `tick()` is called once per frame and records
+    the peak memory allocated on top of what was in use at the previous tick, which shows transient
+    allocations such as a copied frame, and the net change, which shows leaks. Tracing slows every
+    allocation down, so the meter is meant for measurements rather than for normal use.
+
+    :param enabled: Whether anything is traced at all. When disabled, `tick()` returns immediately.
+    :param size: Number of frames the statistics are computed over
+    """
+
+    def __init__(self, enabled=False, size=1024):
+        self.enabled = enabled
+        self.frames = 0
+        self._peaks = np.zeros(size, dtype=np.int64)
+        self._nets = np.zeros(size, dtype=np.int64)
+        self._last = None
+        self._started = False
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        return self
+
+    def tick(self):
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self._last is not None:
+            index = self.frames % len(self._peaks)
+            self._peaks[index] = peak - self._last
+            self._nets[index] = current - self._last
+            self.frames += 1
+        # `reset_peak()` only exists from Python 3.9. Before it the peak never goes back down, so only the
+        # net allocations are measured.
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self._last = current
+
+    def stats(self):
+        count = min(self.frames, len(self._peaks))
+        if not count:
+            return {"frames": 0}
+        peaks, nets = self._peaks[:count] / 1024.0, self._nets[:count] / 1024.0
+        if not hasattr(tracemalloc, "reset_peak"):
+            return {"frames": self.frames, "net_kib_mean": float(nets.mean())}
+        return {
+            "frames": self.frames,
+            "peak_kib_mean": float(peaks.mean()),
+            "peak_kib_p95": float(np.percentile(peaks, 95)),
+            "peak_kib_max": float(peaks.max()),
+            "net_kib_mean": float(nets.mean()),
+        }
+
+    def stop(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
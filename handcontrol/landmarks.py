@@ -0,0 +1,144 @@
+# Landmark helpers shared by `virtual_mouse.py` and `virtual_keyboard.py`.
+#
+# MediaPipe returns every landmark as a separate protobuf message, and reading them one attribute
+# at a time in a Python loop is a noticeable part of the per-frame cost. `landmarks_to_array()`
+# copies the result once per frame into a `(hands, 21, 3)` float32 array, and the other functions
+# evaluate finger states, tip positions and pinch distances for all detected hands at once with
+# NumPy operations on that array.
+
+import numpy as np
+
+# Number of landmarks MediaPipe Hands reports for every hand.
+NUM_LANDMARKS = 21
+
+# Indices of the finger tip landmarks: thumb, index finger, middle finger, ring finger and little
+# finger. The landmark two positions below each tip is used as the bottom of the finger.
+tipIds = [4, 8, 12, 16, 20]
+
+# The thumb is not used when counting open fingers, so only the four other tips are compared.
+FINGER_TIPS = np.array(tipIds[1:])
+FINGER_BOTTOMS = FINGER_TIPS - 2
+
+THUMB_TIP = 4
+INDEX_TIP = 8
+
+# Handedness of a hand, as the user sees it in the mirrored preview, see `handedness_labels()`.
+LEFT = 0
+RIGHT = 1
+
+# Corners of the palm: the wrist and the bottom joints of the index and little fingers.
+WRIST = 0
+INDEX_MCP = 5
+PINKY_MCP = 17
+
+
+def landmarks_to_array(hand_landmarks):
+    """
+    Converts the `multi_hand_landmarks` list returned by `hands.process()` into a single array.
+
+    :param hand_landmarks: The `results.multi_hand_landmarks` list, or `None` when no hand is
+    detected
+    :return: A float32 array of shape `(hands, 21, 3)` with the normalized x, y and z coordinates of
+    every landmark. The array has zero rows when no hand is detected.
+    """
+    if not hand_landmarks:
+        return np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32)
+
+    return np.array(
+        [[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in hand_landmarks],
+        dtype=np.float32,
+    )
+
+
+def mirror_landmarks(hands_array):
+    """
+    Mirrors the landmarks horizontally in place, as if they had been detected on a flipped frame, so
+    the hand moves the cursor the same way it moves in a mirror. Returns the same array.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    """
+    np.subtract(1.0, hands_array[:, :, 0], out=hands_array[:, :, 0])
+    return hands_array
+
+
+def fingers_open(hands_array):
+    """
+    Returns which of the four fingers (index to little finger) are open for every hand. A finger is
+    open when its tip is higher in the image than the landmark two positions below it.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    :return: A boolean array of shape `(hands, 4)`
+    """
+    return hands_array[:, FINGER_TIPS, 1] < hands_array[:, FINGER_BOTTOMS, 1]
+
+
+def count_fingers(hands_array):
+    """
+    Returns the number of open fingers for every hand as an integer array of shape `(hands,)`.
+    """
+    return np.count_nonzero(fingers_open(hands_array), axis=1)
+
+
+def tip_positions(hands_array, width, height, ids=(THUMB_TIP, INDEX_TIP)):
+    """
+    Scales the normalized x and y coordinates of the given landmarks to pixel coordinates.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    :param width: Width of the video frame in pixels
+    :param height: Height of the video frame in pixels
+    :param ids: Indices of the landmarks to return, defaults to the thumb and index finger tips
+    :return: A float32 array of shape `(hands, len(ids), 2)`
+    """
+    return hands_array[:, list(ids), :2] * np.array([width, height], dtype=np.float32)
+
+
+def handedness_labels(multi_handedness, count):
+    """
+    Converts the `multi_handedness` list returned by `hands.process()` into an array of `LEFT` and
+    `RIGHT`, in the order of the hands of `landmarks_to_array()`.
+
+    :param multi_handedness: The `results.multi_handedness` list, or `None`
+    :param count: Number of hands in the landmark array
+    :return: A `(count,)` array of `np.int8`, -1 for the hands without a handedness
+    """
+    labels = np.full(count, -1, dtype=np.int8)
+    for index, classification in enumerate((multi_handedness or [])[:count]):
+        # The model labels the hands as seen on a mirrored image, but it runs on the unflipped camera
+        # image, so its labels are swapped back like the landmarks are mirrored.
+        labels[index] = LEFT if classification.classification[0].label == "Right" else RIGHT
+    return labels
+
+
+def palm_size(hands_array, width, height):
+    """
+    Measures the size of every hand as the mean length of the sides of the triangle between the wrist
+    and the bottom joints of the index and little fingers, in pixels. The palm keeps its shape whatever
+    the fingers do, and when the hand turns one side of the triangle shrinks while the others do not,
+    so the size changes with the distance to the camera much more than with the pose. Dividing a
+    distance by it gives a measure that holds at any resolution and any distance.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    :param width: Width of the video frame in pixels
+    :param height: Height of the video frame in pixels
+    :return: A `(hands,)` array
+    """
+    corners = tip_positions(hands_array, width, height, ids=(WRIST, INDEX_MCP, PINKY_MCP, WRIST))
+    return np.linalg.norm(np.diff(corners, axis=1), axis=2).mean(axis=1)
+
+
+def pinch(hands_array, width, height):
+    """
+    Computes the pinch between the thumb tip and index finger tip for every hand.
+
+    :param hands_array: A `(hands, 21, 3)` array returned by `landmarks_to_array()`
+    :param width: Width of the video frame in pixels
+    :param height: Height of the video frame in pixels
+    :return: A `(centers, distances)` tuple, where `centers` is a `(hands, 2)` array with the pixel
+    position of the point halfway between both tips and `distances` is a `(hands,)` array with the
+    pixel distance between them
+    """
+    tips = tip_positions(hands_array, width, height)
+    thumb, index = tips[:, 0], tips[:, 1]
+    centers = (thumb + index) / 2
+    distances = np.linalg.norm(index - thumb, axis=1)
+    return centers, distances
@@ -0,0 +1,59 @@
+# Camera-to-screen mapping of the cursor.
+#
+# The cursor position used to be recomputed from scratch on every frame as
+# `(center_x / width) * screen_width`, which also meant the hand had to reach the very edges of the
+# camera frame, where the model loses it, to reach the edges of the screen. `ScreenMapping` computes
+# the affine transform from an active region of the frame to the whole screen once, and applies it
+# with two multiply-adds per axis. The active region is the frame minus a margin on every side, or
+# the region measured by the calibration (see `calibration.py`); positions outside of it are clamped
+# to the edges of the screen.
+
+import numpy as np
+
+
+def margin_region(margin):
+    """
+    Returns the active region `(left, top, right, bottom)`, in fractions of the frame, left when a
+    margin of `margin` (a fraction of the frame) is removed from every side.
+    """
+    margin = min(max(margin, 0.0), 0.45)
+    return (margin, margin, 1.0 - margin, 1.0 - margin)
+
+
+class ScreenMapping:
+    """
+    Maps positions in the video frame to positions on the screen.
+
+    :param frame_size: `(width, height)` of the video frames in pixels
+    :param screen_size: `(width, height)` of the screen in pixels
+    :param region: Active region `(left, top, right, bottom)` of the frame, in fractions of its size,
+    mapped to the whole screen. Defaults to the whole frame.
+    """
+
+    def __init__(self, frame_size, screen_size, region=(0.0, 0.0, 1.0, 1.0)):
+        width, height = frame_size
+        screen_width, screen_height = screen_size
+        left, top, right, bottom = region
+        self.frame_size = tuple(frame_size)
+        self.screen_size = tuple(screen_size)
+        self.region = tuple(region)
+
+        # screen = frame * scale + offset on every axis, the 2x3 affine matrix kept in `matrix`.
+        self.scale_x = screen_width / (max(right - left, 1e-3) * width)
+        self.scale_y = screen_height / (max(bottom - top, 1e-3) * height)
+        self.offset_x = -left * width * self.scale_x
+        self.offset_y = -top * height * self.scale_y
+        self.matrix = np.array([[self.scale_x, 0.0, self.offset_x], [0.0, self.scale_y, self.offset_y]])
+        self._max_x = screen_width - 1
+        self._max_y = screen_height - 1
+
+    def apply(self, x, y):
+        """
+        Returns the screen position of the frame position `(x, y)`, clamped to the screen.
+        """
+        screen_x = x * self.scale_x + self.offset_x
+        screen_y = y * self.scale_y + self.offset_y
+        return (
+            0.0 if screen_x < 0.0 else (self._max_x if screen_x > self._max_x else screen_x),
+            0.0 if screen_y < 0.0 else (self._max_y if screen_y > self._max_y else screen_y),
+        )
@@ -0,0 +1,453 @@
+# Multi-process pipeline with shared-memory frame and landmark transfer.
+#
+# In a single process, MediaPipe inference, OpenCV and pynput dispatch share one core and the GIL.
+# This entry point runs capture, inference and the gesture engine with its profiles as separate
+# processes instead. Frames go from the capture process to the inference process through a
+# `SharedRing` in `multiprocessing.shared_memory`, and landmark results go from the inference process
+# to the gesture process of the camera through a second, much smaller ring. Nothing is pickled per
+# frame: only the ring names and shapes are sent once when the processes start.
+#
+# Several cameras and several profiles can run at once, e.g. the mouse on one camera and the media
+# keys on another, or both profiles driven by the same inference pass, here on different hands:
+#
+#     python -m handcontrol multiproc --camera 0 --profile mouse --profile keyboard:0:1
+#     python -m handcontrol multiproc --camera 0 --camera 1 --profile mouse:0 --profile keyboard:1
+#
+# The processes run headless and stop on Ctrl+C or SIGTERM.
+
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .display import install_stop_handlers
+from .gestures import parse_hand
+
+# Largest number of hands the landmark ring has room for.
+MAX_HANDS = 2
+
+
+def _attach(name):
+    """
+    Attaches to an existing shared memory block. Only its creator unlinks it. Before Python 3.13,
+    attaching registers the block with the resource tracker again, which is harmless here because all
+    processes are started from `main()` and share its tracker.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedRing:
+    """
+    A ring of fixed-size array slots in shared memory, written by one process and read by any number
+    of others. Readers always get the newest slot, so a slow reader skips entries instead of falling
+    behind.
+
+    Every slot has a sequence number that the writer sets to -1 while it writes the slot and to the
+    entry's sequence number once it is complete. A reader works on the slot in place and then calls
+    `valid()` to check that the writer did not come back around to that slot in the meantime.
+
+    :param shape: Shape of the array stored in every slot
+    :param dtype: Data type of the arrays
+    :param slots: Number of slots. More slots give readers more time before a slot is reused.
+    :param name: Name of an existing ring to attach to. A new ring is created when it is `None`.
+    """
+
+    def __init__(self, shape, dtype, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.owner = name is None
+
+        header = 8 * (1 + 3 * slots)
+        data_offset = (header + 63) // 64 * 64
+        slot_size = int(np.prod(self.shape)) * self.dtype.itemsize
+        size = data_offset + slot_size * slots
+
+        if self.owner:
+            self._block = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._block = _attach(name)
+        self.name = self._block.name
+
+        buffer = self._block.buf
+        self._latest = np.ndarray((1,), np.int64, buffer, 0)
+        self._seqs = np.ndarray((slots,), np.int64, buffer, 8)
+        self._counts = np.ndarray((slots,), np.int64, buffer, 8 * (1 + slots))
+        self._timestamps = np.ndarray((slots,), np.float64, buffer, 8 * (1 + 2 * slots))
+        self._data = np.ndarray((slots,) + self.shape, self.dtype, buffer, data_offset)
+
+        if self.owner:
+            self._latest[0] = 0
+            self._seqs[:] = 0
+
+    def info(self):
+        """
+        Returns what another process needs to attach to this ring: `SharedRing(**ring.info())`.
+        """
+        return {"shape": self.shape, "dtype": self.dtype.str, "slots": self.slots, "name": self.name}
+
+    def begin_write(self):
+        """
+        Returns the sequence number and the array of the next slot, so the writer can fill it in place,
+        e.g. with `cap.read(image=array)`. `commit()` publishes it.
+        """
+        seq = int(self._latest[0]) + 1
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        return seq, self._data[slot]
+
+    def commit(self, seq, timestamp, count=0):
+        slot = seq % self.slots
+        self._counts[slot] = count
+        self._timestamps[slot] = timestamp
+        self._seqs[slot] = seq
+        self._latest[0] = seq
+
+    def write(self, array, timestamp, count=0):
+        """
+        Copies `array` into the next slot and publishes it. `array` may be shorter than the slot along
+        its first axis, e.g. the landmarks of fewer hands than `MAX_HANDS`.
+        """
+        seq, slot = self.begin_write()
+        slot[: len(array)] = array
+        self.commit(seq, timestamp, count)
+        return seq
+
+    def latest(self, after=0):
+        """
+        Returns `(seq, array, timestamp, count)` for the newest entry if it is newer than `after`,
+        otherwise `None`. `array` is a view of the shared slot, valid until `valid(seq)` turns false.
+        """
+        seq = int(self._latest[0])
+        if seq <= after:
+            return None
+        slot = seq % self.slots
+        if self._seqs[slot] != seq:
+            return None
+        return seq, self._data[slot], float(self._timestamps[slot]), int(self._counts[slot])
+
+    def valid(self, seq):
+        """
+        Returns whether the slot of entry `seq` still holds that entry.
+        """
+        return self._seqs[seq % self.slots] == seq
+
+    def wait(self, after, stop, poll=0.001):
+        """
+        Waits until an entry newer than `after` is available or `stop` is set, and returns it like
+        `latest()` (or `None` when stopped).
+        """
+        while not stop.is_set():
+            entry = self.latest(after)
+            if entry is not None:
+                return entry
+            time.sleep(poll)
+        return None
+
+    def close(self):
+        # The numpy views must be released before the block can be closed.
+        self._latest = self._seqs = self._counts = self._timestamps = self._data = None
+        self._block.close()
+        if self.owner:
+            self._block.unlink()
+
+
+def _ignore_sigint():
+    # Ctrl+C is delivered to the whole process group. The child processes leave it to the main process,
+    # which stops them in order through the shared stop event.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def capture_process(source, settings, tuning, stop, ready, results):
+    """
+    Reads frames from a camera (or a video file, or `"synthetic"`) straight into a shared frame ring.
+
+    :param settings: `CameraSettings` requested from the camera, or `None`
+    :param tuning: Options of `auto_tune()`, see `tuning_from_args()`, or `None`
+    """
+    _ignore_sigint()
+
+    from .camera import open_camera, report_settings
+
+    cap, applied, mismatches = open_camera(source, settings, tuning)
+    try:
+        report_settings(applied, mismatches)
+
+        success, frame = cap.read()
+        if not success:
+            ready.put(None)
+            return
+
+        ring = SharedRing(frame.shape, frame.dtype)
+        ready.put(ring.info())
+
+        frames = 0
+        try:
+            while not stop.is_set():
+                seq, slot = ring.begin_write()
+                success, frame = cap.read(slot)
+                if not success:
+                    break
+                if frame is not slot:
+                    slot[...] = frame
+                ring.commit(seq, time.perf_counter())
+                frames += 1
+        finally:
+            # Readers notice the end of the stream through the stop event, which is set once this
+            # process ends, so the ring can be removed right away.
+            stop.set()
+            results.put(("capture " + source, {"frames": frames}))
+            # Give the readers a moment to let go of the ring before it is unlinked.
+            time.sleep(0.2)
+            ring.close()
+    finally:
+        cap.release()
+
+
+def inference_process(source, frame_info, stop, ready, results, options):
+    """
+    Runs MediaPipe Hands on the newest frame of a frame ring and publishes the landmarks of every frame
+    to a landmark ring.
+    """
+    _ignore_sigint()
+    import mediapipe as mp
+
+    from .frames import FramePreparer
+    from .landmarks import NUM_LANDMARKS, handedness_labels, landmarks_to_array, mirror_landmarks
+    from .roi import RoiHands
+
+    # Every hand of a landmark slot has one more row after its landmarks, whose first value is the
+    # handedness of the hand (see `handedness_labels()`).
+    frames = SharedRing(**frame_info)
+    ring = SharedRing((MAX_HANDS, NUM_LANDMARKS + 1, 3), np.float32)
+    ready.put(ring.info())
+
+    def make_hands():
+        return mp.solutions.hands.Hands(
+            max_num_hands=MAX_HANDS, min_detection_confidence=0.8, min_tracking_confidence=0.5
+        )
+
+    # `--roi` runs one model on the crops and another on the full frames, see `roi.py`.
+    hands = make_hands()
+    if options.get("roi"):
+        hands = RoiHands(hands, make_hands(), roi_size=options.get("roi_size", 256))
+
+    prepare = FramePreparer()
+    seq = 0
+    processed = skipped = torn = 0
+    try:
+        while True:
+            entry = frames.wait(seq, stop)
+            if entry is None:
+                break
+            new_seq, frame, timestamp, _ = entry
+            skipped += new_seq - seq - 1 if seq else 0
+            seq = new_seq
+
+            # The shared slot is converted to RGB into a reused buffer, and the landmarks are mirrored
+            # instead of the image.
+            image = prepare.prepare(frame)
+            if not frames.valid(seq):
+                # The capture process came back around to this slot while it was being read.
+                torn += 1
+                continue
+
+            output = hands.process(image)
+            hands_array = mirror_landmarks(landmarks_to_array(output.multi_hand_landmarks)[:MAX_HANDS])
+            count = len(hands_array)
+            # `seq` is the sequence number of the frame ring, so the landmark slot gets its own.
+            landmark_seq, slot = ring.begin_write()
+            slot[:count, :NUM_LANDMARKS] = hands_array
+            slot[:count, NUM_LANDMARKS, 0] = handedness_labels(output.multi_handedness, count)
+            ring.commit(landmark_seq, timestamp, count)
+            processed += 1
+    finally:
+        hands.close()
+        results.put(("inference " + source, {"processed": processed, "skipped": skipped, "torn": torn}))
+        time.sleep(0.2)
+        frames.close()
+        ring.close()
+
+
+def gesture_process(profiles, frame_size, landmark_info, stop, results, options):
+    """
+    Runs the gesture engine with the given profiles (`"mouse"` and/or `"keyboard"`) on every landmark
+    result of one camera, and sends the input events of every profile through its own
+    `InputDispatcher`.
+    """
+    _ignore_sigint()
+    from .dispatch import InputDispatcher
+
+    ring = SharedRing(**landmark_info)
+
+    dispatchers = {}
+    module = None
+    if "keyboard" in profiles:
+        from . import virtual_keyboard as module
+
+        seek_rate = options.get("seek_rate", 5.0)
+        dispatchers["keyboard"] = InputDispatcher(
+            module.Controller(), rate_limits={module.Key.left: seek_rate, module.Key.right: seek_rate}
+        ).start()
+        module.configure(dispatchers["keyboard"], frame_size, hand=profiles["keyboard"])
+    if "mouse" in profiles:
+        import pyautogui
+        from . import virtual_mouse
+
+        # The keyboard profile, when there is one, is evaluated by the engine of the mouse.
+        others = [module.profile] if module is not None else []
+        module = virtual_mouse
+        dispatchers["mouse"] = InputDispatcher(module.Controller()).start()
+        module.configure(
+            dispatchers["mouse"], frame_size, pyautogui.size(), hand=profiles["mouse"], profiles=others,
+            calibration=options.get("calibration"), margin=options.get("margin", module.MARGIN),
+        )
+
+    seq = 0
+    evaluated = 0
+    try:
+        while True:
+            entry = ring.wait(seq, stop)
+            if entry is None:
+                break
+            seq, hands_array, timestamp, count = entry
+            # The landmarks are tiny, so they are copied out of the slot before the gesture logic runs.
+            hands_array = hands_array[:count].copy()
+            if not ring.valid(seq):
+                continue
+            handedness = hands_array[:, -1, 0].astype(np.int8)
+            module.countFingers(hands_array[:, :-1], timestamp=timestamp, handedness=handedness)
+            evaluated += 1
+    finally:
+        for name, dispatcher in dispatchers.items():
+            dispatcher.stop()
+            results.put(("profile " + name, dispatcher.stats()))
+        results.put(("gestures", dict(module.engine.stats(), evaluated=evaluated)))
+        ring.close()
+
+
+def main(argv=None, prog=None):
+    from .calibration import add_calibration_arguments, load_calibration
+    from .camera import add_camera_arguments, settings_from_args, tuning_from_args
+
+    parser = argparse.ArgumentParser(prog=prog, description="Run the gesture controllers as a multi-process pipeline.")
+    add_camera_arguments(parser, multiple=True)
+    parser.add_argument("--profile", action="append", default=[], help="'mouse' or 'keyboard', optionally followed by ':N' to use the Nth camera and ':N:H' to follow its hand H (0, 1, left or right) (repeatable)")
+    parser.add_argument("--roi", action="store_true", help="run inference on a downscaled crop around the tracked hand")
+    parser.add_argument("--roi-size", type=int, default=256)
+    parser.add_argument("--seek-rate", type=float, default=5.0)
+    parser.add_argument("--margin", type=float, default=0.1, help="fraction of the frame left out on every side of the area mapped to the screen, unless the calibration measured one")
+    add_calibration_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cameras = args.camera or ["0"]
+    # Profiles are grouped by camera, as every camera gets one gesture process running all of its
+    # profiles on the same landmarks.
+    profiles = [{} for _ in cameras]
+    for spec in args.profile or ["mouse"]:
+        name, index, hand = (spec.split(":") + ["0", "0"])[:3]
+        if name not in ("mouse", "keyboard"):
+            parser.error("unknown profile {!r}".format(name))
+        index = int(index or 0)
+        if index >= len(cameras):
+            parser.error("profile {!r} refers to camera {} but only {} given".format(spec, index, len(cameras)))
+        try:
+            profiles[index][name] = parse_hand(hand or "0")
+        except argparse.ArgumentTypeError as error:
+            parser.error("profile {!r}: {}".format(spec, error))
+
+    # The calibration is loaded once here, like `virtual_mouse.main()` does, and sent to the gesture
+    # processes with the other options.
+    options = {
+        "roi": args.roi,
+        "roi_size": args.roi_size,
+        "seek_rate": args.seek_rate,
+        "margin": args.margin,
+        "calibration": load_calibration(args) if any("mouse" in camera_profiles for camera_profiles in profiles) else None,
+    }
+    # Every capture process requests the same settings from its camera. With `--auto-tune`, the
+    # candidates are measured on the capture stage alone, as the model runs in its own process.
+    settings = settings_from_args(args)
+    tuning = tuning_from_args(args, model=False)
+
+    # Processes are started with "spawn" so none of them inherits MediaPipe or OpenCV state from the
+    # parent, which only coordinates them.
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    results = context.Queue()
+    processes = []
+
+    def start(target, *process_args):
+        process = context.Process(target=target, args=process_args, daemon=True)
+        process.start()
+        processes.append(process)
+        return process
+
+    def wait_ready(process, ready):
+        # Returns what the process put on `ready`, or `None` once it died without putting anything, e.g.
+        # after an exception, which would otherwise leave the coordinator waiting forever.
+        while True:
+            try:
+                return ready.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+        try:
+            return ready.get(timeout=0.5)
+        except queue.Empty:
+            return None
+
+    landmark_rings = []
+    for source in cameras:
+        ready = context.Queue()
+        process = start(capture_process, source, settings, tuning, stop, ready, results)
+        frame_info = wait_ready(process, ready)
+        if frame_info is None:
+            stop.set()
+            sys.exit("Could not read from camera {}".format(source))
+
+        process = start(inference_process, source, frame_info, stop, ready, results, options)
+        landmark_info = wait_ready(process, ready)
+        if landmark_info is None:
+            stop.set()
+            sys.exit("The inference process of camera {} failed to start".format(source))
+        landmark_rings.append(((frame_info["shape"][1], frame_info["shape"][0]), landmark_info))
+
+    for camera_profiles, (frame_size, landmark_info) in zip(profiles, landmark_rings):
+        if camera_profiles:
+            start(gesture_process, camera_profiles, frame_size, landmark_info, stop, results, options)
+
+    print("Running {} camera(s) and {} profile(s) in {} processes (pid {}), Ctrl+C to stop".format(
+        len(cameras), sum(map(len, profiles)), len(processes), os.getpid()
+    ))
+
+    # The signal handlers only set a local event: setting the shared one from a handler deadlocks if the
+    # signal arrives while the main thread holds its lock.
+    interrupted = install_stop_handlers()
+    while not interrupted.wait(0.2) and not stop.is_set():
+        if not all(process.is_alive() for process in processes):
+            break
+    stop.set()
+
+    for process in processes:
+        process.join(timeout=5.0)
+
+    while True:
+        try:
+            name, stats = results.get(timeout=0.5)
+        except queue.Empty:
+            break
+        print("{}: {}".format(name, stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# Recording and replay of what the pipeline saw and decided.
+#
+# Debugging a bad pinch or seek used to mean reproducing it live in front of the webcam. `Recorder`
+# appends one fixed-size record per processed frame to a file: the capture time, the mirrored
+# landmark array the gesture logic received, the handedness of every hand and the gesture events the
+# engine emitted on that frame. The file is a 4096-byte header (a magic string followed by JSON) and
+# then nothing but records of `RECORD_DTYPE`, so `open_recording()` maps it with `numpy.memmap`
+# without parsing anything, and hours of recording can be sliced like any array:
+#
+#     recording = open_recording("session.hcrec")
+#     pinch_frames = recording.records[recording.timestamps > t0]
+#
+# `replay()` runs recorded frames through `countFingers()` of the scripts as fast as they can be
+# evaluated, which is also how thresholds are tuned: change a rule, replay, and compare the events
+# with the recorded ones.
+#
+#     handcontrol keyboard --record session.hcrec
+#     handcontrol replay session.hcrec
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .calibration import add_calibration_arguments, load_calibration
+from .landmarks import NUM_LANDMARKS, handedness_labels
+
+MAGIC = b"HCREC\x00\x00\x01"
+HEADER_SIZE = 4096
+
+# Number of hands and of events stored in every record. Further hands are not recorded, and further
+# events on the same frame are counted in `Recorder.overflow`.
+MAX_HANDS = 2
+MAX_EVENTS = 8
+
+# Layout of a record. Every field starts at a multiple of its own size, so the layout is the same
+# with or without alignment and the fields read straight from the mapped file.
+#
+# - `timestamp`: capture time of the frame, in `time.perf_counter()` seconds of the recording process
+# - `hands`: number of hands detected, the rows of `landmarks` and `handedness` after it are unused
+# - `event_count`: number of entries used in `events`
+# - `handedness`: 0 for a left hand, 1 for a right hand, -1 for no hand. Like the landmarks, it is the
+#   hand as seen in the mirrored preview, i.e. the hand of the user.
+# - `score`: confidence of the handedness
+# - `landmarks`: normalized and mirrored landmarks, as passed to `countFingers()`
+# - `events`: gesture events emitted on the frame, see `encode_event()`
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("hands", "u1"),
+    ("event_count", "u1"),
+    ("handedness", "i1", (MAX_HANDS,)),
+    ("score", "<f4", (MAX_HANDS,)),
+    ("landmarks", "<f4", (MAX_HANDS, NUM_LANDMARKS, 3)),
+    ("events", "<u2", (MAX_EVENTS,)),
+])
+
+
+def encode_event(name_index, hand, edge):
+    """
+    Packs a gesture event into the 16-bit value stored in `events`: the index of `profile.rule` in the
+    `event_names` of the header, the hand and whether the gesture starts (`"enter"`) or ends.
+    """
+    return (name_index << 3) | (hand << 1) | (1 if edge == "enter" else 0)
+
+
+def decode_event(value):
+    """
+    Returns the `(name_index, hand, edge)` of a value packed by `encode_event()`.
+    """
+    return value >> 3, (value >> 1) & 3, "enter" if value & 1 else "exit"
+
+
+class Recorder:
+    """
+    Appends a record for every processed frame to a file.
+
+    :param path: File the recording is written to, replaced when it exists
+    :param engine: `GestureEngine` whose events are recorded
+    :param frame_size: `(width, height)` of the camera frames, stored in the header
+    :param metadata: Other values stored in the header, e.g. the camera settings
+    """
+
+    def __init__(self, path, engine, frame_size, metadata=None):
+        self.path = path
+        self.event_names = [
+            profile.name + "." + rule.name for profile in engine.profiles for rule in profile.rules
+        ]
+        self._event_index = {name: index for index, name in enumerate(self.event_names)}
+
+        header = dict(metadata or {})
+        header.update({
+            "version": 1,
+            "record_size": RECORD_DTYPE.itemsize,
+            "max_hands": MAX_HANDS,
+            "max_events": MAX_EVENTS,
+            "frame_size": list(frame_size),
+            "profiles": {profile.name: list(profile.hands) for profile in engine.profiles},
+            "event_names": self.event_names,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        encoded = MAGIC + json.dumps(header).encode("utf-8")
+        if len(encoded) > HEADER_SIZE:
+            raise ValueError("Recording header larger than {} bytes".format(HEADER_SIZE))
+
+        self._file = open(path, "wb")
+        self._file.write(encoded.ljust(HEADER_SIZE, b"\0"))
+
+        # The record is filled in place and written from the same buffer for every frame.
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._events = []
+        self.frames = 0
+        self.events = 0
+        self.overflow = 0
+
+        engine.listeners.append(self._on_event)
+
+    def _on_event(self, profile_name, hand, rule, edge, timestamp):
+        self._events.append(encode_event(self._event_index[profile_name + "." + rule], hand, edge))
+
+    def write(self, hands_array, timestamp, handedness=None):
+        """
+        Writes the record of a frame, with the events the engine emitted since the previous one.
+
+        :param hands_array: The `(hands, 21, 3)` array passed to the gesture engine
+        :param timestamp: Capture time of the frame
+        :param handedness: The `results.multi_handedness` list of MediaPipe, if any
+        """
+        record = self._record[0]
+        hands = min(len(hands_array), MAX_HANDS)
+        record["timestamp"] = timestamp
+        record["hands"] = hands
+        record["landmarks"][:hands] = hands_array[:hands]
+        record["landmarks"][hands:] = 0.0
+        record["handedness"] = -1
+        record["handedness"][:hands] = handedness_labels(handedness, hands)
+        record["score"] = 0.0
+        for index, classification in enumerate((handedness or [])[:hands]):
+            record["score"][index] = classification.classification[0].score
+
+        events = self._events[:MAX_EVENTS]
+        self.overflow += len(self._events) - len(events)
+        record["event_count"] = len(events)
+        record["events"][:len(events)] = events
+        record["events"][len(events):] = 0
+        self.events += len(events)
+        self._events.clear()
+
+        self._file.write(self._record.data)
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+    def stats(self):
+        return {"frames": self.frames, "events": self.events, "overflow": self.overflow}
+
+
+class Recording:
+    """
+    A recording mapped in memory, see `open_recording()`.
+
+    :ivar header: The JSON header of the file
+    :ivar records: Read-only `numpy.memmap` of `RECORD_DTYPE` records, one per frame
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            block = f.read(HEADER_SIZE)
+        if not block.startswith(MAGIC):
+            raise ValueError("{} is not a recording".format(path))
+        self.header = json.loads(block[len(MAGIC):].rstrip(b"\0").decode("utf-8"))
+        if self.header["record_size"] != RECORD_DTYPE.itemsize:
+            raise ValueError("{} has records of {} bytes, expected {}".format(
+                path, self.header["record_size"], RECORD_DTYPE.itemsize
+            ))
+
+        # A recording interrupted in the middle of a record ends with a partial record, which is left
+        # out.
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.event_names = self.header["event_names"]
+        self.frame_size = tuple(self.header["frame_size"])
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    def hands_array(self, index):
+        """
+        Returns the `(hands, 21, 3)` landmark array of a frame, as it was passed to the gesture engine.
+        """
+        record = self.records[index]
+        return record["landmarks"][:record["hands"]]
+
+    def events(self, start=0, stop=None):
+        """
+        Returns the recorded events of a range of frames as `(frame, timestamp, name, hand, edge)`
+        tuples.
+        """
+        records = self.records[start:stop]
+        frames = np.flatnonzero(records["event_count"])
+        events = []
+        for frame in frames:
+            record = records[frame]
+            for value in record["events"][:record["event_count"]]:
+                name_index, hand, edge = decode_event(int(value))
+                events.append((start + int(frame), float(record["timestamp"]), self.event_names[name_index], hand, edge))
+        return events
+
+
+def open_recording(path):
+    """
+    Maps a file written by `Recorder` in memory and returns it as a `Recording`.
+    """
+    return Recording(path)
+
+
+def replay(recording, engine, countFingers, start=0, stop=None):
+    """
+    Runs recorded frames through the gesture logic as fast as possible, with their recorded timestamps.
+
+    :param recording: A `Recording`
+    :param engine: The `GestureEngine` evaluated by `countFingers`, whose events are returned
+    :param countFingers: `countFingers()` of `virtual_mouse` or `virtual_keyboard`, configured with
+    stand-in controllers
+    :return: A `(events, elapsed)` tuple, with the events emitted as the `(frame, timestamp, name, hand,
+    edge)` tuples of `Recording.events()` and the time the replay took
+    """
+    events = []
+    frame = start
+
+    def listener(profile_name, hand, rule, edge, timestamp):
+        events.append((frame, timestamp, profile_name + "." + rule, hand, edge))
+
+    engine.listeners.append(listener)
+    records = recording.records[start:stop]
+    begin = time.perf_counter()
+    try:
+        for record in records:
+            hands = record["hands"]
+            countFingers(record["landmarks"][:hands], timestamp=float(record["timestamp"]), handedness=record["handedness"][:hands])
+            frame += 1
+    finally:
+        engine.listeners.remove(listener)
+    return events, time.perf_counter() - begin
+
+
+def main(argv=None, prog=None):
+    """
+    Replays a recording through the gestures of the scripts and compares the events with the recorded
+    ones.
+    """
+    from .camera import parse_size
+
+    parser = argparse.ArgumentParser(prog=prog, description="Replay a recording through the gesture logic.")
+    parser.add_argument("recording", help="file written with --record")
+    parser.add_argument("--profile", choices=["mouse", "keyboard", "both"], help="gestures to replay, like --media-keys for both (defaults to the recorded ones)")
+    parser.add_argument("--start", type=int, default=0, help="first frame replayed")
+    parser.add_argument("--stop", type=int, help="frame the replay stops before")
+    parser.add_argument("--screen", type=parse_size, default=(1920, 1080), help="screen size used for the cursor mapping")
+    parser.add_argument("--events", action="store_true", help="print every recorded and replayed event")
+    add_calibration_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # The replay never injects real input, so the dummy backend of pynput is selected before the
+    # scripts import it, and their controllers are the stand-ins of the benchmark.
+    os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+    from . import virtual_keyboard, virtual_mouse
+    from .benchmark import RecordingKeyboard, RecordingMouse
+
+    recording = open_recording(args.recording)
+    if not len(recording):
+        sys.exit("{} has no frames".format(args.recording))
+    print("Recording: {} frames, {:.1f}s, {}x{}".format(
+        len(recording), float(recording.timestamps[-1] - recording.timestamps[0]), *recording.frame_size
+    ))
+
+    # The frames replayed must be a non-empty range of the recording, and a stop past its end stops at
+    # its end.
+    stop = len(recording) if args.stop is None else min(args.stop, len(recording))
+    if not 0 <= args.start < stop:
+        sys.exit("No frames between --start {} and --stop {}, {} has {} frames".format(
+            args.start, stop, args.recording, len(recording)
+        ))
+    args.stop = stop
+
+    # The profiles are configured on the hands they followed while recording.
+    hands = recording.header["profiles"]
+    profile = args.profile
+    if profile is None:
+        profile = "both" if len(hands) > 1 else next(iter(hands))
+
+    outputs = []
+    virtual_keyboard.configure(RecordingKeyboard(outputs), recording.frame_size, hand=hands.get("keyboard", [0])[0])
+    profiles = [virtual_keyboard.profile] if profile == "both" else []
+    screen = args.screen
+    virtual_mouse.configure(
+        RecordingMouse(outputs), recording.frame_size, screen, hand=hands.get("mouse", [0])[0], profiles=profiles,
+        calibration=load_calibration(args),
+    )
+    gestures = virtual_keyboard if profile == "keyboard" else virtual_mouse
+
+    replayed, elapsed = replay(recording, gestures.engine, gestures.countFingers, args.start, args.stop)
+
+    # Only the events of the profiles both recorded and replayed are compared.
+    names = set(recording.event_names) & {
+        profile.name + "." + rule.name for profile in gestures.engine.profiles for rule in profile.rules
+    }
+    recorded = [event for event in recording.events(args.start, args.stop) if event[2] in names]
+    replayed = [event for event in replayed if event[2] in names]
+    key = lambda event: (event[0], event[2], event[3], event[4])
+    recorded_keys, replayed_keys = set(map(key, recorded)), set(map(key, replayed))
+
+    if args.events:
+        for event in sorted(set(recorded) | set(replayed), key=key):
+            mark = "=" if key(event) in recorded_keys and key(event) in replayed_keys else ("-" if event in recorded else "+")
+            print("{} frame {} hand {} {} {}".format(mark, event[0], event[3], event[2], event[4]))
+
+    frames = len(recording.records[args.start:args.stop])
+    duration = float(recording.timestamps[args.start:args.stop][-1] - recording.timestamps[args.start:args.stop][0])
+    print("Replayed {} frames in {:.3f}s, {:.0f}x real time".format(
+        frames, elapsed, duration / elapsed if elapsed else float("inf")
+    ))
+    print("Events: {} recorded, {} replayed, {} only recorded, {} only replayed".format(
+        len(recorded), len(replayed), len(recorded_keys - replayed_keys), len(replayed_keys - recorded_keys)
+    ))
@@ -0,0 +1,143 @@
+# Region-of-interest tracking for `hands.process()`.
+#
+# The hand usually covers a small part of the camera frame and barely moves between frames, yet
+# `hands.process(image)` is always run on the whole frame at full resolution. `RoiHands` wraps a
+# `mp_hands.Hands` instance and runs it on a downscaled crop around the hands found in the previous
+# frame instead, then maps the landmarks back to full-frame coordinates so the rest of the pipeline is
+# unchanged. When no hand is found inside the crop the tracking is considered lost, and the same frame
+# is processed again as a (downscaled) full frame to detect the hands anew.
+#
+# The full frames go through a second `mp_hands.Hands` instance. In video mode the model tracks the
+# hands from one call to the next in coordinates normalized to the image it was given, so a single
+# instance alternating between the crop and the full frame would start every pass from landmarks of
+# the other geometry. `reset()` would clear that state but restarts the graph, which costs more than
+# running the model.
+
+from .frames import FrameScaler
+
+
+class RoiHands:
+    """
+    Runs hand inference on a downscaled crop around the hands of the previous frame.
+
+    :param hands: The `mp_hands.Hands` instance run on the crops
+    :param full_hands: The `mp_hands.Hands` instance run on the full frames. Both can be swapped with
+    `replace()`.
+    :param margin: How much the bounding box of the hands is expanded on every side, as a fraction of
+    its size, so the hands stay inside the crop while they move
+    :param roi_size: Longest side, in pixels, the crop is downscaled to before inference
+    :param full_scale: Scale applied to the full frame when the hands have to be detected again
+    :param recenter: Fraction of the crop the hands may move towards its border before the crop is
+    moved. Keeping the crop still while the hands stay inside it keeps the coordinates stable for the
+    tracking MediaPipe does between frames.
+    """
+
+    def __init__(self, hands, full_hands, margin=0.5, roi_size=256, full_scale=0.5, recenter=0.15):
+        self.hands = hands
+        self.full_hands = full_hands
+        self.margin = margin
+        self.roi_size = roi_size
+        self.full_scale = full_scale
+        self.recenter = recenter
+
+        # `roi` is the current crop as `(x0, y0, x1, y1)` pixel coordinates of the full frame, or
+        # `None` when the hands have to be detected on the full frame.
+        self.roi = None
+
+        # The downscaled crop is written into a buffer that is reused as long as the crop keeps the same
+        # size, which is the common case since the crop only moves when the hands approach its border.
+        self._scaler = FrameScaler()
+
+        # Counters showing how often the cheap crop path could be used.
+        self.roi_frames = 0
+        self.full_frames = 0
+        self.tracking_lost = 0
+
+    def process(self, image):
+        """
+        Detects the hands in `image` and returns the MediaPipe results, with the landmarks in
+        normalized full-frame coordinates just like `hands.process(image)` would return them.
+        """
+        height, width = image.shape[:2]
+
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            # The crop is a strided view of the frame, which MediaPipe cannot use by reference, so it is
+            # always written into the buffer, even when it is not downscaled.
+            results = self._run(self.hands, image[y0:y1, x0:x1], self.roi_size / max(x1 - x0, y1 - y0), copy=True)
+            if results.multi_hand_landmarks:
+                self.roi_frames += 1
+                self._to_full_frame(results.multi_hand_landmarks, self.roi, width, height)
+                self._update_roi(results.multi_hand_landmarks, width, height)
+                return results
+
+            # No hand inside the crop: fall back to detecting on the full frame.
+            self.tracking_lost += 1
+            self.roi = None
+
+        self.full_frames += 1
+        results = self._run(self.full_hands, image, self.full_scale)
+        if results.multi_hand_landmarks:
+            self._update_roi(results.multi_hand_landmarks, width, height)
+        return results
+
+    def replace(self, hands, full_hands):
+        """
+        Closes the current models and runs `hands` and `full_hands` instead, keeping the crop and the
+        counters.
+        """
+        if self.hands is not None:
+            self.close()
+        self.hands, self.full_hands = hands, full_hands
+
+    def _run(self, hands, image, scale, copy=False):
+        return hands.process(self._scaler.scale(image, scale, copy))
+
+    @staticmethod
+    def _to_full_frame(hand_landmarks, roi, width, height):
+        # Landmarks are normalized to the crop they were detected in, so they are scaled by the crop
+        # size and offset by its position to get back to normalized full-frame coordinates.
+        x0, y0, x1, y1 = roi
+        scale_x, scale_y = (x1 - x0) / width, (y1 - y0) / height
+        offset_x, offset_y = x0 / width, y0 / height
+        for hand in hand_landmarks:
+            for lm in hand.landmark:
+                lm.x = lm.x * scale_x + offset_x
+                lm.y = lm.y * scale_y + offset_y
+                # z uses roughly the same scale as x
+                lm.z = lm.z * scale_x
+
+    def _update_roi(self, hand_landmarks, width, height):
+        xs = [lm.x for hand in hand_landmarks for lm in hand.landmark]
+        ys = [lm.y for hand in hand_landmarks for lm in hand.landmark]
+        bx0, bx1 = min(xs) * width, max(xs) * width
+        by0, by1 = min(ys) * height, max(ys) * height
+
+        # Keep the current crop while the hands stay well inside it.
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            inset_x, inset_y = (x1 - x0) * self.recenter, (y1 - y0) * self.recenter
+            if bx0 >= x0 + inset_x and bx1 <= x1 - inset_x and by0 >= y0 + inset_y and by1 <= y1 - inset_y:
+                return
+
+        # A square crop centred on the hands, expanded by the margin and clipped to the frame.
+        size = max(bx1 - bx0, by1 - by0) * (1 + 2 * self.margin)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0, x1 = int(max(0, cx - size / 2)), int(min(width, cx + size / 2))
+        y0, y1 = int(max(0, cy - size / 2)), int(min(height, cy + size / 2))
+
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.roi = None
+        else:
+            self.roi = (x0, y0, x1, y1)
+
+    def stats(self):
+        return {
+            "roi_frames": self.roi_frames,
+            "full_frames": self.full_frames,
+            "tracking_lost": self.tracking_lost,
+        }
+
+    def close(self):
+        self.hands.close()
+        self.full_hands.close()
@@ -0,0 +1,163 @@
+    # """
+    # This is a Python program that uses the Mediapipe library to detect hand landmarks and count fingers
+    # to control media playback using keyboard shortcuts.
+    
+    # :param image: The current frame of the video captured by the webcam
+    # :param hand_landmarks: It is a list of detected hand landmarks in the current frame. Each element of
+    # the list represents a hand, and contains the landmarks of that hand as a list of 3D coordinates (x,
+    # y, z) normalized to the range [0, 1]
+    # :param handNo: handNo is a parameter used in the countFingers() function to specify which hand's
+    # landmarks to use for finger counting. By default, it is set to 0, which means it will count the
+    # fingers of the first hand detected in the image. If there are multiple hands in the image,, defaults
+    # to 0 
+    
+    
+# `mediapipe` and `cv2` are not imported here: the camera, the model and the preview are run by the
+# `HandController` that `main()` creates (see `controller.py`), so the gestures below can be imported
+# and reused without loading the model.
+import argparse
+
+from pynput.keyboard import Key, Controller
+
+from .dispatch import InputDispatcher
+from .gestures import Condition, GestureEngine, Profile, Rule
+from .instrumentation import Instrumentation, SampledLogger
+
+# `keyboard` is the controller used to simulate keyboard input, such as pressing the spacebar key to
+# pause a video when the user closes their hand into a fist. `width` and `height` are the size of the
+# video frame captured by the webcam. They are set by `configure()`, either from `main()` with the real
+# camera and pynput controller, or from `benchmark.py` with a recorded video and a stand-in controller.
+keyboard = None
+width, height = 0, 0
+
+# `profile` holds the gesture rules of the media controls bound to the controller, and `engine`
+# evaluates them on every frame, see `gestures.py`. Both are set by `configure()`. The current playback
+# state, "Play" or "Pause", is the state of the profile in the engine.
+profile = None
+engine = None
+
+# `metrics` collects the time spent in every stage of the main loop (see `instrumentation.py`), and
+# `debug` prints the verbose debugging information of `countFingers()` when `--verbose` is given, but
+# only for one frame out of every `--debug-every`, so the terminal output stays out of the hot path.
+metrics = Instrumentation()
+debug = SampledLogger()
+
+def configure(controller, frame_size, hand=0, profiles=()):
+    """
+    Sets the keyboard controller and the frame size used by `countFingers()`.
+
+    :param controller: A `pynput.keyboard.Controller` or an `InputDispatcher` wrapping one, or any
+    object with the same `press()`, `release()` and `tap()` methods
+    :param frame_size: The `(width, height)` of the video frames in pixels
+    :param hand: The hand that controls the video, defaults to 0 (the first hand seen), see `Profile`
+    :param profiles: Other profiles evaluated by the same engine
+    """
+
+    global keyboard, width, height, profile, engine
+
+    keyboard = controller
+    width, height = frame_size
+    profile = Profile("keyboard", RULES, controller, hands=(hand,))
+    engine = GestureEngine([profile, *profiles], frame_size)
+    engine.listeners.append(logGesture)
+
+def logGesture(profile_name, hand, rule, edge, timestamp):
+    debug("Gesture: ", profile_name, hand, rule, edge)
+
+# The gestures of the media controls. The fingers are counted by comparing the y-coordinates of every
+# finger tip and the landmark two positions below it (the bottom of the finger): the finger is open
+# when the tip is higher. The thumb is not taken into account, so the count goes from 0 to 4.
+#
+# PLAY or PAUSE a Video
+# - `play` moves the profile to the "Play" state when the 4 fingers are open.
+# - `pause` closes the hand into a fist while in the "Play" state: it moves to "Pause" and taps the
+#   spacebar. `tap` presses and immediately releases the key, so no key is left held down.
+#
+# Move Video FORWARD & BACKWARDS
+# - With only the index finger open, `seek_backward` taps the left arrow key on every frame while the
+#   tip is more than 62.5% of the frame width from its right edge, and `seek_forward` taps the right
+#   arrow key while it is less than 8% of the width from it (400 and 50 pixels of a 640 pixels wide
+#   frame). The zones are fractions of the frame so they cover the same part of the view at any
+#   resolution. The key taps are rate limited by the `InputDispatcher`. The seek zones only end 3% of
+#   the width past where they start, so a finger resting on the edge of a zone does not start and stop
+#   seeking on alternate frames.
+RULES = [
+    Rule("play", [Condition("fingers", "==", 4)], goto="Play"),
+    Rule("pause", [Condition("fingers", "==", 0)], states=("Play",), goto="Pause", on_enter=("tap", Key.space)),
+    Rule(
+        "seek_backward",
+        [Condition("fingers", "==", 1), Condition("index_from_right_frac", ">", 0.625, release=0.595)],
+        each_frame=("tap", Key.left),
+    ),
+    Rule(
+        "seek_forward",
+        [Condition("fingers", "==", 1), Condition("index_from_right_frac", "<", 0.08, release=0.11)],
+        each_frame=("tap", Key.right),
+    ),
+]
+
+# Define a function to count fingers
+def countFingers(hands_array, timestamp=None, handedness=None):
+    """
+    Evaluates the gestures of every detected hand at once, and uses the hand selected in `configure()`
+    to play, pause and seek the video with keyboard shortcuts.
+
+    :param hands_array: A `(hands, 21, 3)` array of normalized landmark coordinates returned by
+    `landmarks_to_array()`
+    :param timestamp: `time.perf_counter()` value of the moment the frame was captured
+    :param handedness: The handedness of every hand returned by `handedness_labels()`
+    """
+
+    engine.update(hands_array, timestamp, handedness)
+        
+        
+def main(argv=None, prog=None):
+    """
+    Opens the default camera and runs the main loop of the program, which processes the captured
+    frames to detect hand landmarks and control media playback with keyboard shortcuts.
+    """
+
+    # `HandController` imports OpenCV and MediaPipe, so it is only imported when the program runs,
+    # not when the gestures of this module are reused.
+    from .controller import HandController, add_controller_arguments
+
+    parser = argparse.ArgumentParser(prog=prog, description="Control media playback with hand gestures.")
+    add_controller_arguments(parser)
+    parser.add_argument("--seek-rate", type=float, default=5.0, help="maximum number of seek key taps per second")
+    parser.add_argument("--verbose", action="store_true", help="print debugging information")
+    parser.add_argument("--debug-every", type=int, default=30, help="only print the debugging information of one frame out of this many")
+    args = parser.parse_args(argv)
+
+    debug.enabled = args.verbose
+    debug.every = args.debug_every
+
+    # `controller` runs the camera, the model and the gesture engine (see `controller.py`). `open()`
+    # opens the camera selected by `--camera` (the default camera, index 0, unless told otherwise)
+    # with the settings requested on the command line while the model warms up in the background.
+    controller = HandController.from_args(args, metrics=metrics)
+    controller.open()
+
+    # `controller.frame_size` is the width and height of the video frame captured by the webcam, as
+    # read back from the driver. `Controller()` from `pynput.keyboard` is the object used to simulate
+    # pressing and releasing keys. It is wrapped in an `InputDispatcher`, which sends the key presses
+    # from its own thread and limits how many seek taps are sent per second while a finger stays in
+    # the seek zone.
+    dispatcher = InputDispatcher(
+        Controller(), rate_limits={Key.left: args.seek_rate, Key.right: args.seek_rate}, metrics=metrics
+    ).start()
+    controller.add_stats("Dispatch", dispatcher.stats)
+    configure(
+        dispatcher,
+        controller.frame_size,
+    )
+
+    try:
+        controller.run(engine)
+    finally:
+        dispatcher.stop()
+
+    controller.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+	# """
+	# The function uses the Mediapipe library to detect hand landmarks and count fingers, and uses the
+	# pynput library to control the mouse based on hand gestures.
+	
+	# :param image: The current frame captured by the webcam
+	# :param hand_landmarks: A list of detected hand landmarks for each hand in the image. Each hand
+	# landmark is represented by its x, y, and z coordinates normalized to the range [0, 1]
+	# :param handNo: The hand number parameter is used to specify which hand to detect and track. By
+	# default, it is set to 0, which means the first hand detected will be used. If there are multiple
+	# hands in the frame, you can set it to 1 to track the second hand, and so on, defaults to 0
+	# (optional)
+	# """
+ 
+
+# These lines of code are importing the necessary libraries and modules required for the program to
+# run. Specifically, `pynput` is a library for controlling input devices such as the mouse and
+# keyboard, and `gestures` and `landmarks` are the helper modules shared with `virtual_keyboard.py`.
+# `cv2`, the OpenCV library used for image and video processing, is only imported to draw the preview,
+# and `mediapipe`, a library for building machine learning pipelines to process multimedia content, is
+# only imported by the `HandController` that `main()` creates, so the gestures can be imported and
+# reused without loading the model. `pyautogui`, which needs a desktop session to import, is only
+# imported in `main()` as well.
+import argparse
+import time
+
+from pynput.mouse import Button, Controller
+
+from .calibration import DEFAULT_PINCH, DEFAULT_PINCH_RELEASE, add_calibration_arguments, load_calibration
+from .dispatch import InputDispatcher
+from .filters import FILTERS, CursorUpdater, make_filter
+from .gestures import PINCH_RATIO, PINCH_X, PINCH_Y, Condition, GestureEngine, Profile, Rule, parse_hand
+from .instrumentation import Instrumentation, SampledLogger
+from .landmarks import tip_positions
+from .mapping import ScreenMapping, margin_region
+
+# `mouse` is the controller used to move the mouse cursor and simulate mouse clicks, `width` and
+# `height` are the size of the video frame captured by the webcam, and `screen_width` and
+# `screen_height` are the size of the computer screen in pixels. They are set by `configure()`, either
+# from `main()` with the real camera, screen and pynput controller, or from `benchmark.py` with a
+# recorded video and a stand-in controller.
+mouse = None
+width, height = 0, 0
+screen_width, screen_height = 0, 0
+
+# `mapping` is the affine transform from the active region of the video frame to the screen, computed
+# once by `configure()` (see `mapping.py`). The active region is the region measured by the
+# calibration, or the frame minus `MARGIN` on every side, so the edges of the screen are reached
+# without taking the hand to the edges of the frame, where the model loses it.
+MARGIN = 0.1
+mapping = None
+
+# `cursor_filter` smooths the pinch center and predicts where it will be when the cursor is moved (see
+# `filters.py`), and `cursor_updater` moves the cursor along that prediction at display rate. Both are
+# optional: without a filter the measured position is used as is, and without an updater the cursor is
+# moved once per processed frame.
+cursor_filter = None
+cursor_updater = None
+
+# `clock` returns the current time on the clock of the frame timestamps, `time.perf_counter()` for a
+# camera. `benchmark.py` replaces it when it times the frames of a video file by their position in the
+# file instead.
+clock = time.perf_counter
+
+# `metrics` collects the time spent in every stage of the main loop (see `instrumentation.py`), and
+# `debug` prints the verbose debugging information of `countFingers()` when `--verbose` is given, but
+# only for one frame out of every `--debug-every`, so the terminal output stays out of the hot path.
+metrics = Instrumentation()
+debug = SampledLogger()
+
+# `profile` holds the gesture rules of the mouse bound to the controller, and `engine` evaluates them
+# (and the rules of any other profile sharing the same inference pass) on every frame, see
+# `gestures.py`. Both are set by `configure()`.
+profile = None
+engine = None
+
+def configure(controller, frame_size, screen_size, filter=None, updater=None, hand=0, profiles=(), calibration=None, margin=MARGIN):
+	"""
+	Sets the mouse controller, the frame and screen sizes and the cursor filter used by `countFingers()`.
+
+	:param controller: A `pynput.mouse.Controller` or an `InputDispatcher` wrapping one, or any object
+	with the same `position`, `press()` and `release()` members
+	:param frame_size: The `(width, height)` of the video frames in pixels
+	:param screen_size: The `(width, height)` of the computer screen in pixels
+	:param filter: A filter from `filters.py` placed between the pinch center and the screen mapping
+	:param updater: A `CursorUpdater` that moves the cursor at display rate instead of `countFingers()`
+	:param hand: The hand that controls the mouse, defaults to 0 (the first hand seen), see `Profile`
+	:param profiles: Other profiles evaluated by the same engine, e.g. `virtual_keyboard.profile`
+	:param calibration: A `Calibration` whose pinch thresholds and active region are used instead of
+	the defaults
+	:param margin: Fraction of the frame left out on every side of the active region when the
+	calibration has none
+	"""
+
+	global mouse, width, height, screen_width, screen_height, mapping, cursor_filter, cursor_updater, profile, engine
+
+	mouse = controller
+	width, height = frame_size
+	screen_width, screen_height = screen_size
+	cursor_filter = filter
+	cursor_updater = updater
+	rules = RULES
+	region = margin_region(margin)
+	if calibration is not None:
+		rules = makeRules(calibration.pinch, calibration.pinch_release)
+		region = calibration.region or region
+	mapping = ScreenMapping(frame_size, screen_size, region)
+	profile = Profile("mouse", rules, controller, hands=(hand,), on_lost=handLost)
+	engine = GestureEngine([profile, *profiles], frame_size)
+
+def moveCursor(center):
+	"""
+	Sets the mouse position on the screen relative to the output window size.
+
+	:param center: The `(x, y)` position of the pinch center in the video frame, in pixels
+	"""
+
+	# The position of the mouse on the screen is the position of the center of the line between the
+	# finger tip and thumb tip in the video frame, mapped from the active region of the frame to the
+	# screen by the transform `configure()` computed, and clamped to the screen. Finally, it sets the
+	# position of the mouse on the screen using the `mouse.position` function from the `pynput.mouse`
+	# library.
+	center_x, center_y = center
+	mouse.position = mapping.apply(center_x, center_y)
+
+def trackCursor(features, timestamp):
+	"""
+	Moves the cursor to the pinch center of the hand, through the cursor filter when there is one.
+
+	:param features: The feature vector of the hand computed by the gesture engine
+	:param timestamp: `time.perf_counter()` value of the moment the frame was captured, or `None` for
+	now
+	"""
+
+	# `PINCH_X` and `PINCH_Y` are the point halfway between the thumb tip and index finger tip, scaled to
+	# the pixel size of the video frame, and `PINCH_RATIO` the distance between both tips in palm sizes.
+	# The line and circle showing them are drawn separately by `drawPinch()`, and only on the frames that
+	# are previewed.
+	center_x, center_y = features[PINCH_X], features[PINCH_Y]
+
+	# The arguments are evaluated even when nothing is printed, and `mouse.position` queries the system
+	# for the cursor position on every call, so the calls are skipped altogether when debugging is off.
+	if debug.enabled:
+		debug("Pinch ratio: ", features[PINCH_RATIO])
+		debug("Computer Screen Size :",screen_width, screen_height, "Output Window size: ", width, height)
+		debug("Mouse Position: ", mouse.position, "Tips Line Centre Position: ", center_x, center_y)
+
+	# Smooth and Predict the Mouse Position
+	# The cursor filter is fed with the pinch center measured on the frame captured at `timestamp`, and
+	# the cursor is moved to the position it predicts for now, when the cursor is actually moved. With a
+	# `CursorUpdater` running, the updater moves the cursor along the prediction instead.
+	now = clock()
+	if cursor_filter is not None:
+		cursor_filter.update((center_x, center_y), now if timestamp is None else timestamp)
+		if cursor_updater is None:
+			moveCursor(cursor_filter.predict(now))
+	else:
+		moveCursor((center_x, center_y))
+
+def handLost(hand):
+	# The hand is lost, so the track is reset and the cursor stays where it is until the hand is found
+	# again.
+	if cursor_filter is not None:
+		cursor_filter.reset()
+
+# The gestures of the mouse, evaluated in this order on every frame by the gesture engine:
+#
+# - `track` has no condition, so the cursor follows the pinch center whenever the hand is visible.
+# - `pinch` becomes active when the distance between the tips of the thumb and index finger drops to
+#   0.45 palm sizes or less, which presses the left mouse button, and stops being active when the
+#   distance rises above 0.55 palm sizes again, which releases it. The gap in between keeps the button
+#   from being pressed and released repeatedly while the distance hovers around the threshold. Both are
+#   measured in palm sizes (see `palm_size()` in `landmarks.py`) rather than pixels, so they hold at any
+#   resolution and any distance from the camera, and `handcontrol calibrate` can measure them for the
+#   hand that uses them.
+def makeRules(pinch=DEFAULT_PINCH, release=DEFAULT_PINCH_RELEASE):
+	return [
+		Rule("track", [], each_frame=trackCursor),
+		Rule(
+			"pinch",
+			[Condition("pinch_ratio", "<=", pinch, release=release)],
+			on_enter=("press", Button.left),
+			on_exit=("release", Button.left),
+		),
+	]
+
+RULES = makeRules()
+
+# Define a function to count fingers
+def countFingers(hands_array, timestamp=None, handedness=None):
+	"""
+	Evaluates the gestures of every detected hand at once, which moves the mouse and presses or
+	releases the left button with the hand selected in `configure()`, and runs the gestures of the other
+	profiles sharing the engine.
+
+	:param hands_array: A `(hands, 21, 3)` array of normalized landmark coordinates returned by
+	`landmarks_to_array()`
+	:param timestamp: `time.perf_counter()` value of the moment the frame was captured, used by the
+	cursor filter. Defaults to now.
+	:param handedness: The handedness of every hand returned by `handedness_labels()`, which keeps
+	every hand on its own profile when MediaPipe reorders them
+	"""
+
+	engine.update(hands_array, timestamp, handedness)
+
+
+def drawPinch(image, hands_array, handNo=None):
+	"""
+	Draws a line between the finger tip and thumb tip of the hand that controls the mouse, and a circle
+	on the center of that line.
+
+	:param image: The image the overlay is drawn on. It may be a downscaled copy of the frame, so the
+	coordinates are scaled to its own size.
+	:param hands_array: A `(hands, 21, 3)` array of normalized landmark coordinates
+	:param handNo: Index of the hand in `hands_array`. Defaults to the hand the gesture engine assigned
+	to the mouse on the last frame, which is not always the first one once the hands are told apart by
+	their handedness.
+	"""
+
+	if handNo is None:
+		handNo = engine.index(profile.hands[0])
+	if handNo is not None and len(hands_array) > handNo:
+		import cv2
+
+		image_height, image_width = image.shape[:2]
+
+		# The tips are converted to integer pixel coordinates, as they need to be integers to be used
+		# in the `cv2.line()` and `cv2.circle()` functions.
+		thumb_tip, finger_tip = tip_positions(hands_array, image_width, image_height)[handNo]
+		(thumb_tip_x, thumb_tip_y), (finger_tip_x, finger_tip_y) = thumb_tip.astype(int), finger_tip.astype(int)
+
+		# Draw a LINE between FINGER TIP and THUMB TIP
+		cv2.line(image, (finger_tip_x, finger_tip_y),(thumb_tip_x, thumb_tip_y),(255,0,0),2)
+
+		# Draw a CIRCLE on CENTER of the LINE between FINGER TIP and THUMB TIP
+		center_x, center_y = (thumb_tip + finger_tip) / 2
+		cv2.circle(image, (int(center_x), int(center_y)), 2, (0,0,255), 2)
+
+
+def main(argv=None, prog=None):
+	"""
+	Opens the default camera and runs the main loop of the program, which processes the captured frames
+	to detect hand landmarks and control the mouse cursor based on hand gestures.
+	"""
+
+	# `pyautogui` needs a desktop session to import and is only used here, to read the screen size.
+	import pyautogui
+
+	# `HandController` imports OpenCV and MediaPipe, so it is only imported when the program runs, not
+	# when the gestures of this module are reused.
+	from .controller import HandController, add_controller_arguments
+
+	parser = argparse.ArgumentParser(prog=prog, description="Control the mouse cursor with hand gestures.")
+	add_controller_arguments(parser)
+	add_calibration_arguments(parser)
+	parser.add_argument("--margin", type=float, default=MARGIN, help="fraction of the frame left out on every side of the area mapped to the screen, unless the calibration measured one")
+	parser.add_argument("--filter", choices=list(FILTERS), default="none", help="smoothing and prediction applied to the cursor")
+	parser.add_argument("--display-rate", type=float, default=0, help="move the cursor along the prediction this many times per second between frames (0 disables)")
+	parser.add_argument("--media-keys", action="store_true", help="also control media playback with the gestures of virtual_keyboard.py, from the same inference pass")
+	parser.add_argument("--media-hand", type=parse_hand, default=0, help="the hand the media gestures follow with --media-keys: 0 for the same hand as the mouse, 1 for the second hand seen, or left or right")
+	parser.add_argument("--seek-rate", type=float, default=5.0, help="maximum number of seek key taps per second with --media-keys")
+	parser.add_argument("--verbose", action="store_true", help="print debugging information")
+	parser.add_argument("--debug-every", type=int, default=30, help="only print the debugging information of one frame out of this many")
+	args = parser.parse_args(argv)
+
+	debug.enabled = args.verbose
+	debug.every = args.debug_every
+
+	# `controller` runs the camera, the model and the gesture engine (see `controller.py`). `open()`
+	# opens the camera selected by `--camera` with the settings requested on the command line while the
+	# model warms up in the background. With `--media-keys --media-hand 1` the media gestures follow the
+	# second hand, so `--adaptive` never drops to a single hand.
+	controller = HandController.from_args(args, min_hands=2 if args.media_keys and args.media_hand != 0 else 1, metrics=metrics)
+	controller.open()
+
+	# `--filter` selects the smoothing and prediction stage placed between the pinch center and the
+	# screen mapping, and `--display-rate` starts a `CursorUpdater` that moves the cursor along the
+	# prediction between the inference frames.
+	cursor_filter = None
+	if args.filter != "none" or args.display_rate > 0:
+		cursor_filter = make_filter(args.filter)
+	updater = None
+	if args.display_rate > 0:
+		updater = CursorUpdater(cursor_filter, moveCursor, rate=args.display_rate)
+
+	# The pynput `Controller()` is wrapped in an `InputDispatcher`, which moves the cursor and presses
+	# the mouse button from its own thread. Cursor moves that pile up while the thread is busy are
+	# coalesced into the latest one.
+	dispatcher = InputDispatcher(Controller(), metrics=metrics).start()
+	controller.add_stats("Dispatch", dispatcher.stats)
+
+	# The width and height of the video frame captured by the webcam are the ones the driver applied,
+	# read back when the camera was opened, and the size of the computer screen comes from
+	# `pyautogui.size()`. They are used to scale the coordinates of the hand landmarks to the video
+	# frame and the position of the mouse cursor to the screen.
+	frame_size = controller.frame_size
+
+	# With `--media-keys`, the profile of `virtual_keyboard.py` is added to the gesture engine, so the
+	# same landmarks also play, pause and seek the video, on the hand selected by `--media-hand`.
+	profiles = []
+	keyboard_dispatcher = None
+	if args.media_keys:
+		from . import virtual_keyboard
+
+		keyboard_dispatcher = InputDispatcher(
+			virtual_keyboard.Controller(),
+			rate_limits={virtual_keyboard.Key.left: args.seek_rate, virtual_keyboard.Key.right: args.seek_rate},
+			metrics=metrics,
+		).start()
+		virtual_keyboard.configure(keyboard_dispatcher, frame_size, hand=args.media_hand)
+		profiles.append(virtual_keyboard.profile)
+
+	# The pinch thresholds and the active region come from the calibration when there is one (see
+	# `calibration.py`), and the mapping from the active region to the screen is computed once here.
+	configure(
+		dispatcher, frame_size, pyautogui.size(), filter=cursor_filter, updater=updater, profiles=profiles,
+		calibration=load_calibration(args), margin=args.margin,
+	)
+
+	if updater is not None:
+		updater.start()
+
+	# The pinch of the hand that controls the mouse is drawn on the mirrored preview.
+	try:
+		controller.run(engine, overlay=drawPinch)
+	finally:
+		if updater is not None:
+			updater.stop()
+		dispatcher.stop()
+		if keyboard_dispatcher is not None:
+			keyboard_dispatcher.stop()
+
+	controller.report()
+
+
+if __name__ == "__main__":
+	main()
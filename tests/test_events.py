@@ -0,0 +1,80 @@
+import asyncio
+from collections import deque
+
+import numpy as np
+import pytest
+
+from handcontrol.events import (
+    HEADER,
+    KIND_EVENT,
+    KIND_LANDMARKS,
+    EventServer,
+    decode_payload,
+    encode_event,
+    encode_landmarks,
+    parse_address,
+    read_message,
+)
+from handcontrol.landmarks import NUM_LANDMARKS
+
+
+def split(message):
+    kind, arg, length, seq, timestamp = HEADER.unpack(message[:HEADER.size])
+    payload = message[HEADER.size:]
+    assert length == len(payload)
+    return kind, arg, seq, timestamp, decode_payload(kind, arg, payload)
+
+
+def test_landmarks_header():
+    hands = np.random.default_rng(0).random((2, NUM_LANDMARKS, 3), dtype=np.float32)
+    kind, arg, seq, timestamp, payload = split(encode_landmarks(hands, 12.5, seq=7))
+    assert (kind, arg, seq, timestamp) == (KIND_LANDMARKS, 2, 7, 12.5)
+    np.testing.assert_array_equal(payload, hands)
+
+
+def test_event_header():
+    kind, arg, seq, timestamp, payload = split(encode_event("mouse.pinch", 1, "exit", 3.25, seq=0xFFFFFFFF))
+    assert (kind, arg, seq, timestamp) == (KIND_EVENT, 1, 0xFFFFFFFF, 3.25)
+    assert payload == ("mouse.pinch", "exit")
+
+
+def test_read_message_from_stream():
+    hands = np.zeros((0, NUM_LANDMARKS, 3), dtype=np.float32)
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_landmarks(hands, 1.0, seq=1) + encode_event("keyboard.play", 0, "enter", 2.0, seq=2))
+        reader.feed_eof()
+        return [await read_message(reader), await read_message(reader)]
+
+    landmarks, event = asyncio.run(read())
+    assert landmarks[:4] == (KIND_LANDMARKS, 0, 1, 1.0) and landmarks[4].shape == (0, NUM_LANDMARKS, 3)
+    assert event == (KIND_EVENT, 0, 2, 2.0, ("keyboard.play", "enter"))
+
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/hands.sock") == ("unix", "/tmp/hands.sock")
+    assert parse_address("0.0.0.0:8765") == ("tcp", ("0.0.0.0", 8765))
+    assert parse_address("8765") == ("tcp", ("127.0.0.1", 8765))
+
+
+def test_full_queue_drops_landmarks_before_events():
+    landmarks = encode_landmarks(np.zeros((1, NUM_LANDMARKS, 3), dtype=np.float32), 0.0)
+    down, up = encode_event("mouse.pinch", 0, "enter", 0.0), encode_event("mouse.pinch", 0, "exit", 0.0)
+
+    queue = deque([down, landmarks, landmarks])
+    assert EventServer._make_room(queue, up)
+    assert list(queue) == [down, landmarks]
+
+    # A queue holding only events drops a new landmark frame rather than one of them.
+    queue = deque([down, up])
+    assert not EventServer._make_room(queue, landmarks)
+    assert list(queue) == [down, up]
+
+
+def test_unix_server_never_deletes_other_files(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("keep me")
+    with pytest.raises(FileExistsError):
+        EventServer("unix:{}".format(path)).start()
+    assert path.read_text() == "keep me"
@@ -0,0 +1,89 @@
+import numpy as np
+
+from handcontrol.gestures import Condition, GestureEngine, Profile, Rule
+from handcontrol.landmarks import LEFT, NUM_LANDMARKS, RIGHT
+
+WIDTH, HEIGHT = 640, 480
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def press(self, key):
+        self.calls.append(("press", key))
+
+    def release(self, key):
+        self.calls.append(("release", key))
+
+
+def hands_at(*xs):
+    # One hand per x, in pixels, with every landmark on the same point, so `pinch_x` is that x.
+    hands = np.full((len(xs), NUM_LANDMARKS, 3), 0.5, dtype=np.float32)
+    hands[:, :, 0] = np.array(xs, dtype=np.float32)[:, None] / WIDTH
+    return hands
+
+
+def pinch_profile(controller, **kwargs):
+    rule = Rule(
+        "pinch",
+        [Condition("pinch_x", "<", 100, release=120)],
+        on_enter=("press", "left"),
+        on_exit=("release", "left"),
+        goto="held",
+    )
+    return Profile("mouse", [rule], controller, **kwargs)
+
+
+def test_condition_hysteresis():
+    controller = Recorder()
+    engine = GestureEngine([pinch_profile(controller)], (WIDTH, HEIGHT))
+
+    # The rule starts below the threshold, and only ends past the release value.
+    for x in (130, 105, 90, 105, 115, 119):
+        engine.update(hands_at(x))
+    assert controller.calls == [("press", "left")]
+
+    engine.update(hands_at(125))
+    assert controller.calls == [("press", "left"), ("release", "left")]
+
+    # Once released, the threshold applies again.
+    engine.update(hands_at(110))
+    assert len(controller.calls) == 2
+
+
+def test_lost_hand_releases_and_resets():
+    controller = Recorder()
+    lost = []
+    engine = GestureEngine([pinch_profile(controller, initial="idle", on_lost=lost.append)], (WIDTH, HEIGHT))
+
+    engine.update(hands_at(90))
+    assert engine.state("mouse") == "held"
+
+    engine.update(hands_at())
+    assert controller.calls == [("press", "left"), ("release", "left")]
+    assert lost == [0]
+    assert engine.state("mouse") == "idle"
+
+    # The next hand starts without the hysteresis of the lost one.
+    engine.update(hands_at(110))
+    assert len(controller.calls) == 2
+
+
+def test_hands_keep_their_slot_by_handedness():
+    left, right = Recorder(), Recorder()
+    engine = GestureEngine(
+        [pinch_profile(left, hands=("left",)), pinch_profile(right, hands=("right",))], (WIDTH, HEIGHT)
+    )
+
+    engine.update(hands_at(90, 300), handedness=np.array([LEFT, RIGHT], dtype=np.int8))
+    assert left.calls == [("press", "left")] and right.calls == []
+
+    # MediaPipe reports the hands in the other order: nothing changes for either of them.
+    engine.update(hands_at(300, 90), handedness=np.array([RIGHT, LEFT], dtype=np.int8))
+    assert left.calls == [("press", "left")] and right.calls == []
+    assert engine.index("left") == 1
+
+    # Losing the right hand leaves the pinch of the left one held.
+    engine.update(hands_at(90), handedness=np.array([LEFT], dtype=np.int8))
+    assert left.calls == [("press", "left")]
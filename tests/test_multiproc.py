@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+
+from handcontrol.multiproc import SharedRing
+
+
+def make_rings(slots=4):
+    writer = SharedRing((2, 3), np.float32, slots=slots)
+    reader = SharedRing(**writer.info())
+    return writer, reader
+
+
+def test_write_and_read_latest():
+    writer, reader = make_rings()
+    try:
+        assert reader.latest() is None
+
+        writer.write(np.full((2, 3), 1.0, dtype=np.float32), 1.0, count=2)
+        seq = writer.write(np.full((1, 3), 2.0, dtype=np.float32), 2.0, count=1)
+
+        # Only the newest entry is returned, and only once it is newer than `after`.
+        entry_seq, array, timestamp, count = reader.latest()
+        assert (entry_seq, timestamp, count) == (seq, 2.0, 1)
+        np.testing.assert_array_equal(array[:count], np.full((1, 3), 2.0))
+        assert reader.valid(seq)
+        assert reader.latest(after=seq) is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_torn_read_is_detected():
+    writer, reader = make_rings(slots=4)
+    try:
+        seq = writer.write(np.zeros((2, 3), dtype=np.float32), 1.0)
+        read_seq, array, _, _ = reader.latest()
+
+        # The writer comes back around to the slot being read: first while it writes it, then once it
+        # committed a newer entry there.
+        for _ in range(3):
+            writer.write(np.ones((2, 3), dtype=np.float32), 2.0)
+        next_seq, slot = writer.begin_write()
+        assert next_seq % 4 == read_seq % 4
+        assert not reader.valid(read_seq)
+        writer.commit(next_seq, 3.0)
+        assert not reader.valid(read_seq)
+        assert reader.latest(after=seq)[0] == next_seq
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reader_never_sees_a_torn_entry():
+    # Every entry is filled with its own sequence number, so a reader that accepts an entry whose
+    # values differ, after `valid()` said it was intact, has read a torn slot.
+    writer, reader = make_rings(slots=2)
+    stop = threading.Event()
+    torn = []
+
+    def write():
+        for seq in range(1, 20001):
+            writer.write(np.full((2, 3), seq, dtype=np.float32), float(seq))
+        stop.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        after = accepted = 0
+        while True:
+            entry = reader.wait(after, stop, poll=0)
+            if entry is None:
+                break
+            seq, array, _, _ = entry
+            values = array.copy()
+            if not reader.valid(seq):
+                continue
+            if not (values == seq).all():
+                torn.append(seq)
+            after = seq
+            accepted += 1
+    finally:
+        thread.join()
+        reader.close()
+        writer.close()
+
+    assert accepted and not torn
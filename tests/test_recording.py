@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from handcontrol.gestures import Condition, GestureEngine, Profile, Rule
+from handcontrol.landmarks import LEFT, NUM_LANDMARKS, RIGHT
+from handcontrol.recording import HEADER_SIZE, RECORD_DTYPE, Recorder, decode_event, encode_event, open_recording, replay
+
+WIDTH, HEIGHT = 640, 480
+
+
+def make_engine():
+    rule = Rule("pinch", [Condition("pinch_x", "<", 100, release=120)])
+    return GestureEngine([Profile("mouse", [rule], hands=("left",))], (WIDTH, HEIGHT))
+
+
+def classification(label):
+    return SimpleNamespace(classification=[SimpleNamespace(label=label, score=0.75)])
+
+
+def record_session(path):
+    # The left hand (labelled "Right" by the model, which sees the unflipped image) pinches on frame 1
+    # and lets go on frame 3, and the second hand comes and goes.
+    xs = [(130, 300), (90,), (110, 300), (125,), (90, 300)]
+    engine = make_engine()
+    recorder = Recorder(str(path), engine, (WIDTH, HEIGHT), metadata={"camera": "synthetic"})
+    frames = []
+    for index, row in enumerate(xs):
+        hands = np.random.default_rng(index).random((len(row), NUM_LANDMARKS, 3), dtype=np.float32)
+        hands[:, :, 0] = np.array(row, dtype=np.float32)[:, None] / WIDTH
+        multi_handedness = [classification("Right"), classification("Left")][:len(row)]
+        timestamp = 10.0 + index / 30
+        engine.update(hands, timestamp, np.array([LEFT, RIGHT], dtype=np.int8)[:len(row)])
+        recorder.write(hands, timestamp, multi_handedness)
+        frames.append((timestamp, hands))
+    recorder.close()
+    return frames, recorder
+
+
+def test_event_packing():
+    for name_index, hand, edge in [(0, 0, "enter"), (5, 1, "exit"), (8191, 3, "enter")]:
+        assert decode_event(encode_event(name_index, hand, edge)) == (name_index, hand, edge)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "session.hcrec"
+    frames, recorder = record_session(path)
+    assert recorder.stats() == {"frames": 5, "events": 3, "overflow": 0}
+    assert path.stat().st_size == HEADER_SIZE + len(frames) * RECORD_DTYPE.itemsize
+
+    recording = open_recording(str(path))
+    assert isinstance(recording.records, np.memmap)
+    assert len(recording) == len(frames)
+    assert recording.frame_size == (WIDTH, HEIGHT)
+    assert recording.header["camera"] == "synthetic"
+    np.testing.assert_array_equal(recording.timestamps, [timestamp for timestamp, _ in frames])
+    for index, (_, hands) in enumerate(frames):
+        np.testing.assert_array_equal(recording.hands_array(index), hands)
+    assert list(recording.records["handedness"][1]) == [LEFT, -1]
+    assert list(recording.records["handedness"][2]) == [LEFT, RIGHT]
+
+    recorded = [(frame, name, hand, edge) for frame, _, name, hand, edge in recording.events()]
+    assert recorded == [(1, "mouse.pinch", 0, "enter"), (3, "mouse.pinch", 0, "exit"), (4, "mouse.pinch", 0, "enter")]
+
+    # Replaying the frames through a new engine emits the same events again.
+    engine = make_engine()
+    replayed, _ = replay(recording, engine, engine.update)
+    assert replayed == recording.events()
+
+
+def test_partial_record_is_left_out(tmp_path):
+    path = tmp_path / "session.hcrec"
+    record_session(path)
+    with open(str(path), "ab") as f:
+        f.write(b"\0" * (RECORD_DTYPE.itemsize // 2))
+
+    assert len(open_recording(str(path))) == 5